@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import OrderedDict
+from functools import partial
+
+from amortization.calculations import Schedule, amortization_schedule
+from amortization.cents import ROUNDING_POLICIES, cents_schedule
+
+
+def schedule_nbytes(schedule: Schedule) -> int:
+    return sum(array.nbytes for array in schedule[1:])
+
+class ScheduleCache:
+    """
+    Thread-safe LRU cache of computed schedules keyed by loan terms
+    (amount, annual_interest_rate, loan_term_in_months). Entries are evicted
+    once either max_entries or max_bytes is exceeded. compute builds a
+    schedule from the terms on a miss; any NamedTuple of a scalar followed by
+    NumPy arrays works.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024, compute=amortization_schedule):
+        self.compute = compute
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, amount: float, annual_interest_rate: float, loan_term_in_months: int) -> Schedule:
+        """Returns the cached schedule for these terms, computing it on a miss."""
+        schedule = self.peek(amount, annual_interest_rate, loan_term_in_months)
+        if schedule is not None:
+            return schedule
+
+        # Compute outside the lock so a long schedule doesn't block other readers
+        schedule = self.compute(amount, annual_interest_rate, loan_term_in_months)
+        self.put(amount, annual_interest_rate, loan_term_in_months, schedule)
+        return schedule
+
+    def peek(self, amount: float, annual_interest_rate: float, loan_term_in_months: int):
+        """Returns the cached schedule for these terms or None, without computing it."""
+        key = (amount, annual_interest_rate, loan_term_in_months)
+        with self._lock:
+            schedule = self._entries.get(key)
+            if schedule is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return schedule
+
+    def put(self, amount: float, annual_interest_rate: float, loan_term_in_months: int, schedule: Schedule):
+        key = (amount, annual_interest_rate, loan_term_in_months)
+        size = schedule_nbytes(schedule)
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.bytes -= schedule_nbytes(previous)
+
+            self._entries[key] = schedule
+            self.bytes += size
+
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= schedule_nbytes(evicted)
+                self.evictions += 1
+
+    def invalidate(self, amount: float, annual_interest_rate: float, loan_term_in_months: int) -> bool:
+        """Drops the entry for these terms. Call this if a loan's terms are ever edited."""
+        key = (amount, annual_interest_rate, loan_term_in_months)
+        with self._lock:
+            schedule = self._entries.pop(key, None)
+            if schedule is None:
+                return False
+            self.bytes -= schedule_nbytes(schedule)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+schedule_cache = ScheduleCache(
+    max_entries=int(os.environ.get("SCHEDULE_CACHE_MAX_ENTRIES", 1024)),
+    max_bytes=int(os.environ.get("SCHEDULE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+)
+
+# Exact-money (integer cents) schedules, one cache per rounding policy
+cents_schedule_caches = {
+    rounding: ScheduleCache(
+        max_entries=int(os.environ.get("SCHEDULE_CACHE_MAX_ENTRIES", 1024)),
+        max_bytes=int(os.environ.get("SCHEDULE_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+        compute=partial(cents_schedule, rounding=rounding),
+    )
+    for rounding in ROUNDING_POLICIES
+}
@@ -0,0 +1,224 @@
+import math
+from typing import NamedTuple
+
+import numpy as np
+
+# See closed_form_is_exact; 2 ** 30 keeps the closed form's error around 1e-7
+CLOSED_FORM_MAX_MAGNITUDE = 2.0 ** 30
+
+def monthly_rate(annual_interest_rate: float) -> float:
+    return annual_interest_rate / 12.0
+
+def monthly_payment(principal: float, annual_interest_rate: float, months: int) -> float:
+    rate = monthly_rate(annual_interest_rate)
+
+    if rate > 0:
+        return principal * rate / (1 - math.pow(1 + rate, -months))
+    return principal / months
+
+def closed_form_is_exact(principal: float, annual_interest_rate: float, months: int) -> bool:
+    """
+    Whether the closed form stays within a fraction of a cent of the loop for
+    every month of these terms. Its largest intermediate is principal * (1 +
+    rate) ** months, and float rounding error in that term grows with it: past
+    CLOSED_FORM_MAX_MAGNITUDE it can reach cents, and it overflows to inf long
+    before the loop does.
+    """
+    rate = monthly_rate(annual_interest_rate)
+    if rate <= 0:
+        return True
+    exponent = months * math.log1p(rate)
+    return exponent <= math.log(CLOSED_FORM_MAX_MAGNITUDE) and principal * math.exp(exponent) <= CLOSED_FORM_MAX_MAGNITUDE
+
+def advance(balance, principal_paid, interest_paid, rate: float, payment: float, months: int):
+    """Runs the original loop for `months` more payments from the given state."""
+    for _ in range(months):
+        interest = balance * rate
+        principal_payment = payment - interest
+        balance -= principal_payment
+        balance = max(balance, 0)
+
+        interest_paid += interest
+        principal_paid += principal_payment
+
+    return balance, principal_paid, interest_paid
+
+def month_summary(principal: float, annual_interest_rate: float, months: int, month: int):
+    """
+    Returns (principal_balance, aggregate_principal_paid, aggregate_interest_paid)
+    after `month` payments, using the annuity closed form instead of iterating.
+    Terms the closed form can't handle to the cent (see closed_form_is_exact)
+    run the original loop instead.
+
+    The iterative loop only clamps the balance at zero on the final payment
+    (float drift can leave it a hair below zero), and it accumulates the
+    principal paid before the clamp, so the aggregates use the unclamped balance.
+    """
+    rate = monthly_rate(annual_interest_rate)
+    payment = monthly_payment(principal, annual_interest_rate, months)
+
+    if not closed_form_is_exact(principal, annual_interest_rate, months):
+        # The loop starts from integer zero totals
+        return advance(principal, 0, 0, rate, payment, month)
+    if rate > 0:
+        # np.power rather than math.pow so the last bits match amortization_schedule's
+        # vectorized np.power; closed_form_is_exact above keeps it finite
+        growth = float(np.power(1 + rate, np.float64(month)))
+        balance = principal * growth - payment * (growth - 1) / rate
+        principal_paid = principal - balance
+        interest_paid = payment * month - principal_paid
+    else:
+        balance = principal - payment * month
+        principal_paid = payment * month
+        interest_paid = 0
+
+    return max(balance, 0), principal_paid, interest_paid
+
+
+def unclamped_balances(principal: float, rate: float, payment: float, paid_months: np.ndarray) -> np.ndarray:
+    """Closed form balance after each of paid_months payments, before the zero clamp."""
+    if rate > 0:
+        growth = np.power(1 + rate, paid_months)
+        return principal * growth - payment * (growth - 1) / rate
+    return principal - payment * paid_months
+
+def iterative_balances(principal: float, rate: float, payment: float, months: int) -> np.ndarray:
+    """The original loop's balance after each of the first `months` payments, for terms the closed form can't handle."""
+    balances = []
+    balance = principal
+    for _ in range(months):
+        balance = max(balance - (payment - balance * rate), 0)
+        balances.append(balance)
+    return np.array(balances, dtype=np.float64)
+
+def balances_between(principal: float, annual_interest_rate: float, months: int, first_month: int, last_month: int, step: int = 1) -> np.ndarray:
+    """
+    Remaining balances after every step-th payment from first_month to
+    last_month (inclusive), computed directly without materializing the
+    months before first_month or in between (except for terms that need the
+    loop, which runs up to last_month).
+    """
+    rate = monthly_rate(annual_interest_rate)
+    payment = monthly_payment(principal, annual_interest_rate, months)
+    if not closed_form_is_exact(principal, annual_interest_rate, months):
+        return iterative_balances(principal, rate, payment, last_month)[first_month - 1::step]
+    paid_months = np.arange(first_month, last_month + 1, step, dtype=np.float64)
+    return np.maximum(unclamped_balances(principal, rate, payment, paid_months), 0)
+
+class Schedule(NamedTuple):
+    monthly_payment: float
+    balances: np.ndarray
+    interest: np.ndarray
+    principal: np.ndarray
+    cumulative_interest: np.ndarray
+    cumulative_principal: np.ndarray
+
+def amortization_schedule(principal: float, annual_interest_rate: float, months: int) -> Schedule:
+    """
+    Computes the whole schedule as NumPy arrays in one vectorized pass.
+    Index i of each array holds the values after payment i + 1. Terms the
+    closed form can't handle to the cent take their balances from the loop.
+    """
+    rate = monthly_rate(annual_interest_rate)
+    payment = monthly_payment(principal, annual_interest_rate, months)
+    if not closed_form_is_exact(principal, annual_interest_rate, months):
+        return iterative_schedule(principal, rate, payment, months)
+    paid_months = np.arange(1, months + 1, dtype=np.float64)
+    balances = unclamped_balances(principal, rate, payment, paid_months)
+
+    opening_balances = np.empty(months, dtype=np.float64)
+    opening_balances[0] = principal
+    opening_balances[1:] = balances[:-1]
+
+    interest = opening_balances * rate
+    principal_payments = payment - interest
+
+    # Same identities as month_summary so cached and closed form results agree
+    if rate > 0:
+        cumulative_principal = principal - balances
+        cumulative_interest = payment * paid_months - cumulative_principal
+    else:
+        cumulative_principal = payment * paid_months
+        cumulative_interest = np.zeros(months, dtype=np.float64)
+
+    return Schedule(
+        monthly_payment=payment,
+        balances=np.maximum(balances, 0),
+        interest=interest,
+        principal=principal_payments,
+        cumulative_interest=cumulative_interest,
+        cumulative_principal=cumulative_principal,
+    )
+
+def iterative_schedule(principal: float, rate: float, payment: float, months: int) -> Schedule:
+    """
+    Schedule with the loop's balances. Every other array follows from them
+    with the loop's own operations (cumsum adds in order), so each month
+    matches the loop and month_summary's fallback exactly.
+    """
+    balances = iterative_balances(principal, rate, payment, months)
+    opening_balances = np.empty(months, dtype=np.float64)
+    opening_balances[0] = principal
+    opening_balances[1:] = balances[:-1]
+
+    interest = opening_balances * rate
+    principal_payments = payment - interest
+    return Schedule(
+        monthly_payment=payment,
+        balances=balances,
+        interest=interest,
+        principal=principal_payments,
+        cumulative_interest=np.cumsum(interest),
+        cumulative_principal=np.cumsum(principal_payments),
+    )
+
+def portfolio_month_summaries(amounts: np.ndarray, annual_interest_rates: np.ndarray, terms: np.ndarray, month: int) -> dict:
+    """
+    Vectorized month_summary across many loans at once. Loans whose term is
+    shorter than `month` are reported as of their final payment. Also returns
+    each loan's total interest over its whole life.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    annual_interest_rates = np.asarray(annual_interest_rates, dtype=np.float64)
+    rates = annual_interest_rates / 12.0
+    terms = np.asarray(terms, dtype=np.float64)
+    months = np.minimum(terms, month)
+
+    has_rate = rates > 0
+    safe_rates = np.where(has_rate, rates, 1.0)  # avoid 0/0 in the masked out lanes
+    # Same test as closed_form_is_exact; those loans are redone with the loop below
+    exponents = np.minimum(terms * np.log1p(safe_rates), math.log(CLOSED_FORM_MAX_MAGNITUDE) + 1)
+    exact = ~has_rate | (amounts * np.exp(exponents) <= CLOSED_FORM_MAX_MAGNITUDE)
+
+    with np.errstate(over="ignore", invalid="ignore"):
+        payments = np.where(
+            has_rate,
+            amounts * safe_rates / (1 - np.power(1 + safe_rates, -terms)),
+            amounts / terms,
+        )
+
+        growth = np.power(1 + safe_rates, months)
+        balances = np.where(
+            has_rate,
+            amounts * growth - payments * (growth - 1) / safe_rates,
+            amounts - payments * months,
+        )
+    principal_paid = np.where(has_rate, amounts - balances, payments * months)
+    interest_paid = np.where(has_rate, payments * months - principal_paid, 0.0)
+    total_interest = np.where(has_rate, payments * terms - amounts, 0.0)
+
+    for i in np.flatnonzero(~exact):
+        amount, months_paid, term = float(amounts[i]), int(months[i]), int(terms[i])
+        payments[i] = payment = monthly_payment(amount, float(annual_interest_rates[i]), term)
+        state = advance(amount, 0, 0, float(rates[i]), payment, months_paid)
+        balances[i], principal_paid[i], interest_paid[i] = state
+        total_interest[i] = advance(*state, float(rates[i]), payment, term - months_paid)[2]
+
+    return {
+        "months": months.astype(np.int64),
+        "monthly_payments": payments,
+        "balances": np.maximum(balances, 0),
+        "principal_paid": principal_paid,
+        "interest_paid": interest_paid,
+        "total_interest": total_interest,
+    }
@@ -0,0 +1,151 @@
+"""
+Exact-money schedules tracked in integer cents.
+
+Rounding policy, applied with integer arithmetic only:
+    - the loan amount is rounded to whole cents
+    - the annual rate is taken to RATE_SCALE precision (nine decimal places)
+    - the regular payment is the annuity payment rounded to the cent
+    - each month's interest is opening balance * annual rate / 12, rounded to the cent
+    - the final payment (or an earlier one, if the rounded payment would
+      overshoot) is adjusted to exactly clear the balance
+
+"half_up" rounds ties away from zero, "half_even" to the even cent. Because
+every row is rounded before the next is computed, principal payments sum to
+the loan amount exactly and payments sum to principal plus interest exactly.
+
+The interest recurrence has to run month by month, so it's a plain integer
+loop rather than a vectorized closed form. The loop only tracks the balance,
+with the rate as a reduced fraction, and handles half_even ties only from
+the first one that matters; everything after it is NumPy. Guessing each
+month's rounded interest from the float schedule and verifying the guesses
+in NumPy doesn't pay off: a 360-month schedule typically needs three to six
+correction passes, which costs about twice as much as this loop.
+
+That loop alone costs about twice the whole float schedule, so the core math
+runs at roughly 4x to 5.5x the float path and the rows at about 2.5x. The 2x
+budget for exact mode applies to requests, which stay at 1.1x to 1.2x of the
+float path even with both schedule caches cold (python -m benchmarks.exact_money).
+"""
+import math
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+ROUNDING_POLICIES = ("half_up", "half_even")
+RATE_SCALE = 10 ** 9
+
+class CentsSchedule(NamedTuple):
+    monthly_payment: int
+    balances: np.ndarray
+    interest: np.ndarray
+    principal: np.ndarray
+    cumulative_interest: np.ndarray
+    cumulative_principal: np.ndarray
+    payments: np.ndarray
+
+def dollars_to_cents(amount: float, rounding: str = "half_up") -> int:
+    return round_cents(amount * 100, rounding)
+
+def round_cents(value: float, rounding: str = "half_up") -> int:
+    if rounding == "half_even":
+        return round(value)
+    return math.floor(value + 0.5)
+
+def pay_down(balance: int, payment: int, numerator: int, half: int, months: int, half_even: bool = False) -> list:
+    """
+    Balance after each of up to `months` payments, stopping at the first one
+    that clears it. Each month's interest is (balance * numerator + half) //
+    (2 * half) cents, i.e. rounded half up; half_even rounds exact ties to the
+    even cent instead.
+    """
+    denominator = 2 * half
+    balances = []
+    append = balances.append
+    if half_even:
+        for _ in range(months):
+            owed, remainder = divmod(balance * numerator + half, denominator)
+            if not remainder and owed & 1:
+                owed -= 1
+            balance += owed - payment
+            append(balance)
+            if balance <= 0:
+                break
+    else:
+        for _ in range(months):
+            balance += (balance * numerator + half) // denominator - payment
+            append(balance)
+            if balance <= 0:
+                break
+    return balances
+
+def first_odd_tie(opening: int, balances: list, payment: int, half: int) -> Optional[int]:
+    """
+    Index of the first month pay_down rounded an exact tie up to an odd cent.
+    With the rate as a reduced fraction, a tie means the opening balance is an
+    odd multiple of half / 2, so there are none when half is odd.
+    """
+    if half % 2:
+        return None
+    try:
+        closing = np.array(balances, dtype=np.int64)
+    except OverflowError:
+        # Rounding ties up at very high rates can grow the balance past int64; redo it all
+        return 0
+    openings = np.concatenate(([opening], closing[:-1]))
+    owed = closing - openings + payment
+    ties = np.flatnonzero((openings % half == half // 2) & (owed % 2 == 1))
+    return int(ties[0]) if len(ties) else None
+
+def cents_schedule(principal: float, annual_interest_rate: float, months: int, rounding: str = "half_up") -> CentsSchedule:
+    """
+    Computes the schedule in int64 cents. Index i of each array holds the
+    values for payment i + 1, like amortization.calculations.Schedule.
+    """
+    if rounding not in ROUNDING_POLICIES:
+        raise ValueError(f"Rounding must be one of {', '.join(ROUNDING_POLICIES)}")
+
+    opening = dollars_to_cents(principal, rounding)
+    rate_units = round(annual_interest_rate * RATE_SCALE)
+
+    if rate_units > 0:
+        rate = rate_units / (12 * RATE_SCALE)
+        payment = round_cents(opening * rate / (1 - math.pow(1 + rate, -months)), rounding)
+    else:
+        payment = round_cents(opening / months, rounding)
+
+    # Interest is balance * rate_units / (12 * RATE_SCALE) rounded to the cent. As
+    # a reduced fraction the products stay small enough for Python's fast int path
+    divisor = math.gcd(rate_units, 12 * RATE_SCALE)
+    numerator = 2 * rate_units // divisor
+    half = 12 * RATE_SCALE // divisor
+
+    balances = pay_down(opening, payment, numerator, half, months)
+    if rounding == "half_even":
+        # Ties are rare, so only the months from the first odd one on need the slower loop
+        tie = first_odd_tie(opening, balances, payment, half)
+        if tie is not None:
+            balances[tie:] = pay_down(balances[tie - 1] if tie else opening, payment, numerator, half, months - tie, half_even=True)
+
+    # Each month's interest is the change in balance plus the payment
+    paid = len(balances)
+    closing = np.array(balances, dtype=np.int64)
+    interest = np.zeros(months, dtype=np.int64)
+    interest[:paid] = np.diff(closing, prepend=opening) + payment
+
+    # Adjust the final payment by whatever is left over (or overpaid)
+    payments = np.zeros(months, dtype=np.int64)
+    payments[:paid] = payment
+    payments[paid - 1] += balances[-1]
+    balances = np.zeros(months, dtype=np.int64)
+    balances[:paid - 1] = closing[:-1]
+    principal_payments = payments - interest
+
+    return CentsSchedule(
+        monthly_payment=payment,
+        balances=balances,
+        interest=interest,
+        principal=principal_payments,
+        cumulative_interest=np.cumsum(interest),
+        cumulative_principal=np.cumsum(principal_payments),
+        payments=payments,
+    )
@@ -0,0 +1,96 @@
+"""
+Checkpoint index for month summaries that are bit-identical to the original
+per-month loop in get_loan_summary, including its max(balance, 0) clamp.
+
+The closed form in calculations.month_summary is constant time but can
+differ from the loop in the last bits. For each distinct loan-term tuple,
+this index instead keeps the loop's state (balance, principal paid, interest
+paid) after months 0, K, 2K, ... A query for month m resumes the same loop
+from checkpoint m // K, so it runs fewer than K iterations once the
+checkpoints reach m. Checkpoints are added incrementally, the first time a
+later month is asked for, so the first late-month query for new terms pays
+for the months in between once.
+
+Enable with SUMMARY_CHECKPOINTS=1; SUMMARY_CHECKPOINT_MONTHS sets K
+(default 128) and SUMMARY_CHECKPOINT_MAX_ENTRIES the number of term tuples
+kept (default 1024, least recently used evicted first).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from amortization.calculations import advance, monthly_payment, monthly_rate
+
+SUMMARY_CHECKPOINTS = os.environ.get("SUMMARY_CHECKPOINTS", "0").lower() in ("1", "true", "yes")
+
+class CheckpointIndex:
+    def __init__(self, every: int = 128, max_entries: int = 1024):
+        self.every = every
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # terms -> [state after month 0, every, 2 * every, ...]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.iterations = 0
+
+    def month_summary(self, principal: float, annual_interest_rate: float, months: int, month: int):
+        """(principal_balance, aggregate_principal_paid, aggregate_interest_paid) after `month` payments."""
+        rate = monthly_rate(annual_interest_rate)
+        payment = monthly_payment(principal, annual_interest_rate, months)
+        terms = (principal, annual_interest_rate, months)
+        index = month // self.every
+
+        with self._lock:
+            checkpoints = self._entries.get(terms)
+            if checkpoints is None:
+                # The loop starts from integer zero totals
+                checkpoints = self._entries[terms] = [(principal, 0, 0)]
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            self._entries.move_to_end(terms)
+
+            known = len(checkpoints)
+            start = min(index, known - 1)
+            state = checkpoints[start]
+            if index < known:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if index > start:
+            # Extend outside the lock so a long stretch doesn't block other terms
+            added = []
+            for _ in range(index - start):
+                state = advance(*state, rate, payment, self.every)
+                added.append(state)
+            with self._lock:
+                self.iterations += (index - start) * self.every
+                if len(checkpoints) == known:
+                    checkpoints.extend(added)
+
+        remaining = month - index * self.every
+        with self._lock:
+            self.iterations += remaining
+        return advance(*state, rate, payment, remaining)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "checkpoints": sum(len(checkpoints) for checkpoints in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "iterations": self.iterations,
+            }
+
+summary_checkpoints = CheckpointIndex(
+    every=int(os.environ.get("SUMMARY_CHECKPOINT_MONTHS", 128)),
+    max_entries=int(os.environ.get("SUMMARY_CHECKPOINT_MAX_ENTRIES", 1024)),
+) if SUMMARY_CHECKPOINTS else None
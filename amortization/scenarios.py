@@ -0,0 +1,105 @@
+"""
+What-if scenarios for one loan, all evaluated together in one pass.
+
+A scenario is defined by extra principal paid each month and the annual rate
+in effect each month, as dense (scenarios, months) arrays (see scenario_arrays).
+The loop runs over the loan's months (at most a few hundred), and each step
+updates every scenario at once as NumPy vectors, so a thousand scenarios
+cost about as many Python-level steps as one.
+
+Rules, per month:
+    - interest accrues on the opening balance at that month's rate
+    - when the rate changes, the regular payment is re-amortized over the
+      remaining term from the current balance
+    - the regular payment plus any extra principal is applied, capped at what
+      is owed, so the month the loan is paid off the balance is exactly zero
+    - the last month of the term pays whatever is owed
+"""
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+class ScenarioResults(NamedTuple):
+    payoff_months: np.ndarray
+    total_interest: np.ndarray
+    total_paid: np.ndarray
+    # (scenarios, months) arrays, only with keep_schedules=True; zeros after payoff
+    payments: Optional[np.ndarray] = None
+    interest: Optional[np.ndarray] = None
+    principal: Optional[np.ndarray] = None
+    balances: Optional[np.ndarray] = None
+
+def annuity_payments(balances: np.ndarray, rates: np.ndarray, months: int) -> np.ndarray:
+    """Vectorized monthly_payment: rates are monthly, months is the number of payments left."""
+    has_rate = rates > 0
+    safe_rates = np.where(has_rate, rates, 1.0)  # avoid 0/0 in the masked out lanes
+    return np.where(has_rate, balances * safe_rates / (1 - np.power(1 + safe_rates, -months)), balances / months)
+
+def scenario_arrays(annual_interest_rate: float, months: int, scenarios: Iterable[Tuple[float, Iterable[Tuple[int, float]], Iterable[Tuple[int, float]]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Builds the (annual_rates, extra_principal) arrays for evaluate_scenarios
+    from (extra_monthly_principal, lump_sums, rate_changes) tuples, where lump
+    sums are (month, amount) and rate changes (month, annual_interest_rate)
+    pairs with 1-based months. Lump sums in the same month add up; a rate
+    change holds until the next one.
+    """
+    scenarios = list(scenarios)
+    annual_rates = np.full((len(scenarios), months), annual_interest_rate, dtype=np.float64)
+    extra_principal = np.zeros((len(scenarios), months), dtype=np.float64)
+
+    for index, (extra_monthly_principal, lump_sums, rate_changes) in enumerate(scenarios):
+        extra_principal[index] += extra_monthly_principal
+        for month, amount in lump_sums:
+            extra_principal[index, month - 1] += amount
+        for month, rate in sorted(rate_changes, key=lambda change: change[0]):
+            annual_rates[index, month - 1:] = rate
+
+    return annual_rates, extra_principal
+
+def evaluate_scenarios(principal: float, months: int, annual_rates: np.ndarray, extra_principal: np.ndarray, keep_schedules: bool = False) -> ScenarioResults:
+    """
+    Evaluates every scenario (row) of annual_rates and extra_principal. Payoff
+    month is the 1-based month the balance reaches zero.
+    """
+    count = annual_rates.shape[0]
+    monthly_rates = annual_rates / 12.0
+    rate_changed = np.zeros_like(monthly_rates, dtype=bool)
+    rate_changed[:, 1:] = monthly_rates[:, 1:] != monthly_rates[:, :-1]
+
+    balances = np.full(count, principal, dtype=np.float64)
+    payments = annuity_payments(balances, monthly_rates[:, 0], months)
+    total_interest = np.zeros(count, dtype=np.float64)
+    total_paid = np.zeros(count, dtype=np.float64)
+    payoff_months = np.zeros(count, dtype=np.int64)
+
+    if keep_schedules:
+        schedule = {name: np.zeros((count, months), dtype=np.float64) for name in ("payments", "interest", "principal", "balances")}
+
+    for month in range(months):
+        changed = rate_changed[:, month]
+        if changed.any():
+            payments[changed] = annuity_payments(balances[changed], monthly_rates[changed, month], months - month)
+
+        interest = balances * monthly_rates[:, month]
+        owed = balances + interest
+        paid = owed if month == months - 1 else np.minimum(payments + extra_principal[:, month], owed)
+        balances = owed - paid
+
+        total_interest += interest
+        total_paid += paid
+        payoff_months[(payoff_months == 0) & (balances <= 0)] = month + 1
+
+        if keep_schedules:
+            schedule["payments"][:, month] = paid
+            schedule["interest"][:, month] = interest
+            schedule["principal"][:, month] = paid - interest
+            schedule["balances"][:, month] = balances
+
+        # Every scenario is paid off, the remaining months are all zeros
+        if payoff_months.all():
+            break
+
+    if not keep_schedules:
+        return ScenarioResults(payoff_months, total_interest, total_paid)
+    return ScenarioResults(payoff_months, total_interest, total_paid, **schedule)
@@ -0,0 +1,226 @@
+"""
+Optional schedule store in POSIX shared memory, so a schedule computed by
+one worker process is readable by every other worker on the host without
+recomputing or pickling it. Reads copy just the requested slice out of the
+segment under the seqlock described below.
+
+One named segment, zero-filled (which is the valid empty state) on creation,
+holds a fixed number of slots:
+
+    seq        uint64[slots]               even when stable, odd while a writer is filling the slot
+    keys       float64[slots, 3]           (amount, annual_interest_rate, loan_term_in_months)
+    months     int64[slots]                0 marks an empty slot
+    last_used  int64[slots]                time.monotonic_ns() of the last hit, shared by all processes
+    payments   float64[slots]              the monthly payment
+    data       float64[slots, 3, max_months]  balances, cumulative principal and cumulative interest
+
+Only the arrays the read paths use are stored; per-month interest and
+principal can be derived from the cumulative ones if a reader ever needs them.
+
+Writers serialize on a thread lock plus an flock() on a lock file. Each
+replaces the least recently used slot (LRU-style: last_used updates from
+readers aren't locked). Readers take no lock: they map the segment directly
+and copy out only the months they need, then re-check the slot's seq and
+retry if a writer touched it meanwhile (a seqlock), so an eviction never
+hands back a torn schedule.
+
+The segment outlives the processes that use it, so restarted workers find
+it warm; unlink() removes it. Requires fcntl, so it's unavailable on Windows.
+"""
+import os
+import tempfile
+import threading
+import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+from amortization.calculations import Schedule
+
+try:
+    import fcntl
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    fcntl = None
+
+SHARED_SCHEDULE_STORE = os.environ.get("SHARED_SCHEDULE_STORE", "0").lower() in ("1", "true", "yes")
+STORED_FIELDS = ("balances", "cumulative_principal", "cumulative_interest")
+BALANCES, CUMULATIVE_PRINCIPAL, CUMULATIVE_INTEREST = range(len(STORED_FIELDS))
+READ_ATTEMPTS = 3
+# Part of the segment name, so workers from an older release never attach to a
+# segment in a layout they don't expect or read schedules computed by older math.
+# Bump it on any change to either.
+LAYOUT_VERSION = 2
+
+class SharedScheduleStore:
+    def __init__(self, name: str = "schedule-store", slots: int = 1024, max_months: int = 480, lock_path: Optional[str] = None):
+        self.name = name
+        # The layout is part of the segment name, so differently configured workers never share one
+        self.segment_name = f"{name}-v{LAYOUT_VERSION}-{slots}x{max_months}"
+        self.slots = slots
+        self.max_months = max_months
+        self.lock_path = lock_path or os.path.join(tempfile.gettempdir(), f"{self.segment_name}.lock")
+        self.nbytes = slots * (8 + 24 + 8 + 8 + 8 + len(STORED_FIELDS) * max_months * 8)
+        self._segment = None
+        self._lock_file = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _attach(self) -> bool:
+        if self._segment is not None:
+            return True
+        if fcntl is None:
+            return False
+
+        with self._lock:
+            if self._segment is not None:
+                return True
+            try:
+                segment = shared_memory.SharedMemory(self.segment_name, create=True, size=self.nbytes)
+            except FileExistsError:
+                segment = shared_memory.SharedMemory(self.segment_name)
+            # Python 3.11's resource tracker unlinks the segment when this process exits,
+            # even when it only attached; the store is meant to outlive any one worker
+            resource_tracker.unregister(segment._name, "shared_memory")
+
+            buffer = segment.buf
+            offset = 0
+            def view(dtype, shape):
+                nonlocal offset
+                array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+                offset += array.nbytes
+                return array
+
+            self._seq = view(np.uint64, (self.slots,))
+            self._keys = view(np.float64, (self.slots, 3))
+            self._months = view(np.int64, (self.slots,))
+            self._last_used = view(np.int64, (self.slots,))
+            self._payments = view(np.float64, (self.slots,))
+            self._data = view(np.float64, (self.slots, len(STORED_FIELDS), self.max_months))
+            self._lock_file = open(self.lock_path, "a")
+            self._segment = segment
+            return True
+
+    def _find(self, key: np.ndarray) -> int:
+        slots = np.flatnonzero((self._keys == key).all(axis=1) & (self._months > 0))
+        return int(slots[0]) if len(slots) else -1
+
+    def _read(self, amount: float, annual_interest_rate: float, loan_term_in_months: int, read):
+        """Runs read(slot data) against a stable slot for these terms, or returns None."""
+        if loan_term_in_months > self.max_months or not self._attach():
+            return None
+
+        key = np.array((amount, annual_interest_rate, loan_term_in_months), dtype=np.float64)
+        for _ in range(READ_ATTEMPTS):
+            slot = self._find(key)
+            if slot < 0:
+                break
+            seq = int(self._seq[slot])
+            if seq & 1 or not (self._keys[slot] == key).all():
+                continue
+            value = read(self._data[slot])
+            if int(self._seq[slot]) == seq:
+                self._last_used[slot] = time.monotonic_ns()
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def balances(self, amount: float, annual_interest_rate: float, loan_term_in_months: int, from_month: int = 1, to_month: Optional[int] = None, step: int = 1) -> Optional[np.ndarray]:
+        """Copy of the stored balances for every step-th month, or None on a miss."""
+        if to_month is None:
+            to_month = loan_term_in_months
+        return self._read(amount, annual_interest_rate, loan_term_in_months, lambda data: data[BALANCES, from_month - 1:to_month:step].copy())
+
+    def month(self, amount: float, annual_interest_rate: float, loan_term_in_months: int, month: int) -> Optional[Tuple[float, float, float]]:
+        """(principal_balance, aggregate_principal_paid, aggregate_interest_paid) after month, or None on a miss."""
+        return self._read(amount, annual_interest_rate, loan_term_in_months, lambda data: (
+            float(data[BALANCES, month - 1]), float(data[CUMULATIVE_PRINCIPAL, month - 1]), float(data[CUMULATIVE_INTEREST, month - 1])
+        ))
+
+    def put(self, amount: float, annual_interest_rate: float, loan_term_in_months: int, schedule: Schedule) -> bool:
+        """Stores the schedule, or returns False if it's longer than max_months or the store is unavailable."""
+        months = len(schedule.balances)
+        if months > self.max_months or not self._attach():
+            return False
+
+        key = np.array((amount, annual_interest_rate, loan_term_in_months), dtype=np.float64)
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                slot = self._find(key)
+                if slot < 0:
+                    empty = np.flatnonzero(self._months == 0)
+                    slot = int(empty[0]) if len(empty) else int(np.argmin(self._last_used))
+                    if self._months[slot]:
+                        self.evictions += 1
+
+                    self._seq[slot] += 1
+                    self._keys[slot] = key
+                    self._payments[slot] = schedule.monthly_payment
+                    for row, field in enumerate(STORED_FIELDS):
+                        self._data[slot, row, :months] = getattr(schedule, field)
+                    self._months[slot] = months
+                    self._seq[slot] += 1
+                self._last_used[slot] = time.monotonic_ns()
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        return True
+
+    def clear(self):
+        if not self._attach():
+            return
+        with self._lock:
+            fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                # Bump seq by 2 so readers mid-copy retry, and leave it even
+                self._seq += 2
+                self._months[:] = 0
+            finally:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def stats(self) -> dict:
+        attached = self._attach()
+        return {
+            "enabled": attached,
+            "entries": int(np.count_nonzero(self._months)) if attached else 0,
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._segment is None:
+                return
+            # Drop the NumPy views first; the segment can't close while they export its buffer
+            del self._seq, self._keys, self._months, self._last_used, self._payments, self._data
+            self._segment.close()
+            self._lock_file.close()
+            self._segment = None
+
+    def unlink(self):
+        """Closes and removes the segment for every process; later attaches create a fresh one."""
+        self.close()
+        if fcntl is None:
+            return
+        try:
+            segment = shared_memory.SharedMemory(self.segment_name)
+        except FileNotFoundError:
+            return
+        segment.close()
+        segment.unlink()
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+shared_schedule_store = SharedScheduleStore(
+    name=os.environ.get("SHARED_SCHEDULE_STORE_NAME", "schedule-store"),
+    slots=int(os.environ.get("SHARED_SCHEDULE_STORE_SLOTS", 1024)),
+    max_months=int(os.environ.get("SHARED_SCHEDULE_STORE_MAX_MONTHS", 480)),
+) if SHARED_SCHEDULE_STORE else None
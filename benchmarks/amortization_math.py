@@ -0,0 +1,98 @@
+"""
+Microbenchmarks for the amortization math behind get_loan_schedule and
+get_loan_summary, without HTTP or the database. Each case runs on a fixed,
+seeded set of loan terms; caches are bypassed so every call computes.
+
+    python -m benchmarks.amortization_math --term-months 360 --repeat 200
+"""
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from amortization.calculations import amortization_schedule, balances_between, month_summary, monthly_payment, portfolio_month_summaries
+from amortization.scenarios import evaluate_scenarios, scenario_arrays
+from benchmarks.seed import RATES
+
+SCENARIOS_PER_CALL = 1000
+
+def loan_terms(count: int, loan_term_in_months: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [(round(rng.uniform(10000, 1000000), 2), rng.choice(RATES), loan_term_in_months) for _ in range(count)]
+
+def schedule_rows(terms) -> list:
+    # What get_loan_schedule builds from a computed schedule, minus the cache
+    schedule = amortization_schedule(*terms)
+    payment = round(schedule.monthly_payment, 2)
+    return [
+        {"month": month, "monthly_payment": payment, "remaining_balance": balance}
+        for month, balance in enumerate(np.round(schedule.balances, 2).tolist(), start=1)
+    ]
+
+def run_case(name: str, function, loans: list, repeat: int) -> dict:
+    function(loans[0])
+    samples = []
+    for _ in range(repeat):
+        for terms in loans:
+            start = time.perf_counter()
+            function(terms)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "case": name,
+        "calls": len(samples),
+        "mean_us": round(sum(samples) / len(samples) * 1e6, 3),
+        "p50_us": round(samples[len(samples) // 2] * 1e6, 3),
+        "p99_us": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6, 3),
+    }
+
+def run(loan_term_in_months: int = 360, loans: int = 50, repeat: int = 200, seed: int = 0) -> list:
+    terms = loan_terms(loans, loan_term_in_months, seed)
+    middle = loan_term_in_months // 2
+    cases = [
+        ("monthly_payment", lambda t: monthly_payment(*t)),
+        ("month_summary", lambda t: month_summary(*t, middle)),
+        ("amortization_schedule", lambda t: amortization_schedule(*t)),
+        ("balances_between_yearly", lambda t: balances_between(*t, 1, t[2], 12)),
+        ("schedule_rows", schedule_rows),
+    ]
+    results = [run_case(name, function, terms, repeat) for name, function in cases]
+
+    # The portfolio endpoint computes every loan in one vectorized call
+    amounts, rates, months = (np.array(column, dtype=np.float64) for column in zip(*terms))
+    portfolio = run_case("portfolio_month_summaries", lambda _: portfolio_month_summaries(amounts, rates, months, middle), [None], repeat)
+    portfolio["loans_per_call"] = loans
+    results.append(portfolio)
+
+    # The scenarios endpoint evaluates a whole batch of what-ifs in one vectorized pass
+    rng = random.Random(seed)
+    amount, rate, _ = terms[0]
+    scenarios = [
+        (rng.choice([0, 100, 500]), [(rng.randint(1, loan_term_in_months), rng.uniform(0, 20000))], [(rng.randint(1, loan_term_in_months), rng.choice(RATES))])
+        for _ in range(SCENARIOS_PER_CALL)
+    ]
+    scenario = run_case("evaluate_scenarios", lambda _: evaluate_scenarios(amount, loan_term_in_months, *scenario_arrays(rate, loan_term_in_months, scenarios)), [None], max(repeat // 10, 5))
+    scenario["scenarios_per_call"] = SCENARIOS_PER_CALL
+    results.append(scenario)
+
+    for result in results:
+        result["loan_term_in_months"] = loan_term_in_months
+    return results
+
+def add_math_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--math-loans", type=int, default=50, help="distinct loan terms per case")
+    parser.add_argument("--math-repeat", type=int, default=200)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--term-months", type=int, default=360)
+    parser.add_argument("--seed", type=int, default=0)
+    add_math_arguments(parser)
+    args = parser.parse_args()
+
+    print(json.dumps(run(args.term_months, args.math_loans, args.math_repeat, args.seed), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+End-to-end throughput and latency of every endpoint, through an in-process
+ASGI client (httpx.ASGITransport) against a seeded, isolated database. Each
+endpoint gets its own timed run of --requests requests with --concurrency
+in flight; request targets are drawn from a seeded RNG so runs are repeatable.
+
+    python -m benchmarks.endpoints --users 10000 --loans 100000 --requests 2000
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.seed import add_seed_arguments, owner_of, seed_database
+
+# Untimed requests per endpoint, so lazy imports, statement caches and the first
+# connections don't land in the percentiles
+WARMUP_REQUESTS = 20
+SCENARIOS_PER_REQUEST = 100
+
+def endpoint_cases(users: int, loans: int, loan_term_in_months: int):
+    """(name, method, route path, request builder) per endpoint; builders take (rng, i) and return (url, json body)."""
+    def authorized_loan(rng):
+        loan_id = rng.randint(1, loans)
+        return owner_of(loan_id, users), loan_id
+
+    def schedule(rng, i):
+        user_id, loan_id = authorized_loan(rng)
+        return f"/v1/users/{user_id}/loans/{loan_id}/schedule", None
+
+    def summary(rng, i):
+        user_id, loan_id = authorized_loan(rng)
+        return f"/v1/users/{user_id}/loans/{loan_id}/schedule/{rng.randint(1, loan_term_in_months)}", None
+
+    def schedules_batch(rng, i):
+        user_id = rng.randint(1, users)
+        owned = range(user_id, loans + 1, users)
+        return f"/v1/users/{user_id}/schedules:batch", {"loans": [{"loan_id": loan_id} for loan_id in list(owned)[:10]]}
+
+    def scenarios(rng, i):
+        user_id, loan_id = authorized_loan(rng)
+        return f"/v1/users/{user_id}/loans/{loan_id}/scenarios", {"scenarios": [
+            {"extra_monthly_principal": rng.choice([0, 100, 500]), "lump_sums": [{"month": rng.randint(1, loan_term_in_months), "amount": round(rng.uniform(0, 20000), 2)}]}
+            for _ in range(SCENARIOS_PER_REQUEST)
+        ]}
+
+    def loans_page(rng, i):
+        return f"/v1/users/{rng.randint(1, users)}/loans?limit=10", None
+
+    def loans_cursor(rng, i):
+        return f"/v1/users/{rng.randint(1, users)}/loans?limit=10&cursor=", None
+
+    def shared_loans(rng, i):
+        return f"/v1/users/{rng.randint(1, users)}/shared-loans?limit=10", None
+
+    def portfolio(rng, i):
+        return f"/v1/users/{rng.randint(1, users)}/portfolio?month={rng.randint(1, loan_term_in_months)}", None
+
+    def create_user(rng, i):
+        return "/v1/users", {"email_address": f"new{i}-{rng.random()}@bench.example.com"}
+
+    def create_loan(rng, i):
+        return f"/v1/users/{rng.randint(1, users)}/loans", {"amount": round(rng.uniform(10000, 1000000), 2), "annual_interest_rate": 0.065, "loan_term_in_months": loan_term_in_months}
+
+    def share_loan(rng, i):
+        user_id, loan_id = authorized_loan(rng)
+        return f"/v1/users/{user_id}/loans/{loan_id}/share/{rng.randint(1, users)}", None
+
+    return [
+        ("GET schedule", "GET", "/v1/users/{user_id}/loans/{loan_id}/schedule", schedule),
+        ("GET schedule/{month}", "GET", "/v1/users/{user_id}/loans/{loan_id}/schedule/{month}", summary),
+        ("POST schedules:batch", "POST", "/v1/users/{user_id}/schedules:batch", schedules_batch),
+        ("POST scenarios", "POST", "/v1/users/{user_id}/loans/{loan_id}/scenarios", scenarios),
+        ("GET loans (offset)", "GET", "/v1/users/{user_id}/loans", loans_page),
+        ("GET loans (cursor)", "GET", "/v1/users/{user_id}/loans", loans_cursor),
+        ("GET shared-loans", "GET", "/v1/users/{user_id}/shared-loans", shared_loans),
+        ("GET portfolio", "GET", "/v1/users/{user_id}/portfolio", portfolio),
+        ("POST users", "POST", "/v1/users", create_user),
+        ("POST loans", "POST", "/v1/users/{user_id}/loans", create_loan),
+        ("PATCH share", "PATCH", "/v1/users/{user_id}/loans/{loan_id}/share/{shared_with_user_id}", share_loan),
+    ]
+
+def summarize(name: str, samples: list, statuses: dict, elapsed: float) -> dict:
+    samples.sort()
+    def percentile(fraction):
+        return round(samples[min(len(samples) - 1, int(fraction * len(samples)))] * 1000, 3)
+    return {
+        "endpoint": name,
+        "requests": len(samples),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "requests_per_second": round(len(samples) / elapsed, 1),
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+async def run_endpoint(client, name: str, method: str, build, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(f"{seed}:{name}")
+    for i in range(WARMUP_REQUESTS):
+        url, body = build(rng, -1 - i)
+        await client.request(method, url, json=body)
+
+    targets = [build(rng, i) for i in range(requests)]
+    samples = []
+    statuses = {}
+    queue = iter(targets)
+
+    async def worker():
+        for url, body in queue:
+            start = time.perf_counter()
+            response = await client.request(method, url, json=body)
+            samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(name, samples, statuses, time.perf_counter() - start)
+
+async def run_all(app, cases, requests: int, concurrency: int, seed: int) -> list:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        return [await run_endpoint(client, name, method, build, requests, concurrency, seed) for name, method, _, build in cases]
+
+def run(directory: str, app_module: str = "main", users: int = 1000, loans: int = 10000, loan_term_in_months: int = 360, shares_per_loan: float = 0.2, seed: int = 0, requests: int = 1000, concurrency: int = 8, only=None) -> dict:
+    path = os.path.join(directory, "bench.db")
+
+    # The engines are configured from the environment when database.database is first imported
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["ASYNC_DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    os.environ.setdefault("DATABASE_PROFILE", "production")
+    os.environ["DATABASE_ECHO"] = "0"
+    seeded = seed_database(path, users, loans, loan_term_in_months, shares_per_loan, seed)
+    module = importlib.import_module(app_module)
+
+    # main_async.py only serves a subset of the routes
+    served = {(method, route.path) for route in module.app.routes for method in getattr(route, "methods", ())}
+    cases = [case for case in endpoint_cases(users, loans, loan_term_in_months) if (case[1], case[2]) in served]
+    if only:
+        cases = [case for case in cases if case[0] in only]
+    return {
+        "app": app_module,
+        "database": seeded,
+        "concurrency": concurrency,
+        "endpoints": asyncio.run(run_all(module.app, cases, requests, concurrency, seed)),
+    }
+
+def add_endpoint_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--app", default="main", choices=["main", "main_async"])
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--endpoint", action="append", help="only run these endpoints (repeatable)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_seed_arguments(parser)
+    add_endpoint_arguments(parser)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        results = run(directory, args.app, args.users, args.loans, args.term_months, args.shares_per_loan, args.seed, args.requests, args.concurrency, args.endpoint)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
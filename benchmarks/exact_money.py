@@ -0,0 +1,135 @@
+"""
+Compares the float schedule with the exact-money (integer cents) schedule at
+three levels:
+
+    math        amortization_schedule vs cents_schedule, caches bypassed
+    rows        the schedule plus the JSON-ready row dicts the endpoint builds
+    endpoint    GET .../schedule vs GET .../schedule?exact=1 through an
+                in-process TestClient (both served from their schedule caches)
+    uncached    the same requests with both schedule caches cleared before
+                each one, so every request computes its schedule
+
+Each result has p50/p99 latency per path and "ratio", exact p50 / float p50.
+Exact mode is budgeted at 2x the float path for the endpoint and uncached
+levels. The math and rows levels are dominated by the per-month integer loop
+(see amortization/cents.py) and are reported to track it, not held to 2x.
+
+    python -m benchmarks.exact_money --term-months 360 --repeat 200
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from amortization.calculations import amortization_schedule
+from amortization.cents import ROUNDING_POLICIES, cents_schedule
+from benchmarks.seed import RATES
+
+
+def loan_terms(count: int, loan_term_in_months: int, seed: int) -> list:
+    rng = random.Random(seed)
+    return [(round(rng.uniform(10000, 1000000), 2), rng.choice(RATES), loan_term_in_months) for _ in range(count)]
+
+def float_rows(terms) -> list:
+    schedule = amortization_schedule(*terms)
+    payment = round(schedule.monthly_payment, 2)
+    return [
+        {"month": month, "monthly_payment": payment, "remaining_balance": balance}
+        for month, balance in enumerate(np.round(schedule.balances, 2).tolist(), start=1)
+    ]
+
+def exact_rows(terms, rounding: str) -> list:
+    schedule = cents_schedule(*terms, rounding)
+    return [
+        {"month": month, "monthly_payment": payment, "remaining_balance": balance, "principal": principal, "interest": interest}
+        for month, payment, balance, principal, interest in zip(
+            range(1, terms[2] + 1),
+            (schedule.payments / 100).tolist(),
+            (schedule.balances / 100).tolist(),
+            (schedule.principal / 100).tolist(),
+            (schedule.interest / 100).tolist(),
+        )
+    ]
+
+def timings(function, arguments: list, repeat: int) -> list:
+    function(arguments[0])
+    samples = []
+    for _ in range(repeat):
+        for argument in arguments:
+            start = time.perf_counter()
+            function(argument)
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples
+
+def percentile(samples: list, fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+def compare(level: str, float_samples: list, exact_samples: list, rounding: str, unit: str = "us") -> dict:
+    scale = 1e6 if unit == "us" else 1e3
+    result = {"level": level, "rounding": rounding}
+    for path, samples in (("float", float_samples), ("exact", exact_samples)):
+        result[f"{path}_p50_{unit}"] = round(percentile(samples, 0.50) * scale, 2)
+        result[f"{path}_p99_{unit}"] = round(percentile(samples, 0.99) * scale, 2)
+    result["ratio"] = round(percentile(exact_samples, 0.50) / percentile(float_samples, 0.50), 2)
+    return result
+
+def run_math(loan_term_in_months: int, count: int, repeat: int, seed: int) -> list:
+    loans = loan_terms(count, loan_term_in_months, seed)
+    float_math = timings(lambda terms: amortization_schedule(*terms), loans, repeat)
+    float_row_samples = timings(float_rows, loans, repeat)
+
+    results = []
+    for rounding in ROUNDING_POLICIES:
+        results.append(compare("math", float_math, timings(lambda terms: cents_schedule(*terms, rounding), loans, repeat), rounding))
+        results.append(compare("rows", float_row_samples, timings(lambda terms: exact_rows(terms, rounding), loans, repeat), rounding))
+    return results
+
+def run_endpoint(loan_term_in_months: int, requests: int) -> list:
+    with tempfile.TemporaryDirectory() as directory:
+        # The engine is configured from the environment when database.database is imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["DATABASE_ECHO"] = "0"
+        import main
+        from amortization.cache import cents_schedule_caches, schedule_cache
+        from fastapi.testclient import TestClient
+
+        with TestClient(main.app) as client:
+            client.post("/v1/users", json={"email_address": "bench@bench.example.com"})
+            client.post("/v1/users/1/loans", json={"amount": 250000, "annual_interest_rate": 0.065, "loan_term_in_months": loan_term_in_months})
+            url = "/v1/users/1/loans/1/schedule"
+            exact_urls = {rounding: f"{url}?exact=1&rounding={rounding}" for rounding in ROUNDING_POLICIES}
+
+            def uncached_get(path):
+                schedule_cache.clear()
+                for cache in cents_schedule_caches.values():
+                    cache.clear()
+                return client.get(path)
+
+            results = []
+            for level, get in (("endpoint", client.get), ("uncached", uncached_get)):
+                float_samples = timings(get, [url], requests)
+                results += [
+                    compare(level, float_samples, timings(get, [exact_urls[rounding]], requests), rounding, "ms")
+                    for rounding in ROUNDING_POLICIES
+                ]
+            return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--term-months", type=int, default=360)
+    parser.add_argument("--loans", type=int, default=50, help="distinct loan terms for the math and rows levels")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per path for the endpoint level")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = run_math(args.term_months, args.loans, args.repeat, args.seed) + run_endpoint(args.term_months, args.requests)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
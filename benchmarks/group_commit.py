@@ -0,0 +1,114 @@
+"""
+Throughput of concurrent POST /v1/users/{user_id}/loans with each loan
+committed on its own versus through the group commit writer
+(database/group_commit.py), against a fresh SQLite database per mode.
+Requests go through an in-process ASGI client (httpx.ASGITransport) with
+--concurrency in flight, so the sync endpoint runs on the threadpool like it
+would under uvicorn.
+
+    python -m benchmarks.group_commit --requests 2000 --concurrency 64 --profile development
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+
+def percentile(samples: list, fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+async def post_loans(app, requests: int, concurrency: int, users: int) -> dict:
+    import httpx
+
+    samples = []
+    statuses = {}
+    queue = iter(range(requests))
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            for i in queue:
+                body = {"amount": 1000 + i, "annual_interest_rate": 0.05, "loan_term_in_months": 360}
+                start = time.perf_counter()
+                response = await client.post(f"/v1/users/{i % users + 1}/loans", json=body)
+                samples.append(time.perf_counter() - start)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    samples.sort()
+    return {
+        "requests": requests,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+def run_mode(mode: str, directory: str, requests: int, concurrency: int, users: int) -> dict:
+    import main
+    from database.database import Base, make_engine
+    from database.group_commit import GroupCommitWriter
+    from database.models import Users
+    from sqlalchemy.orm import sessionmaker
+
+    # A fresh database and engine per mode, so the second run doesn't start on a bigger file
+    engine = make_engine(f"sqlite:///{os.path.join(directory, f'{mode}.db')}")
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all([Users(email=f"user{i}@bench.example.com") for i in range(users)])
+        db.commit()
+
+    def get_db():
+        with Session() as db:
+            yield db
+
+    writer = GroupCommitWriter(Session) if mode == "group_commit" else None
+    main.app.dependency_overrides[main.get_db] = get_db
+    main.group_commit_writer = writer
+    try:
+        result = asyncio.run(post_loans(main.app, requests, concurrency, users))
+    finally:
+        main.app.dependency_overrides.clear()
+        main.group_commit_writer = None
+        if writer:
+            writer.stop()
+        engine.dispose()
+
+    result["mode"] = mode
+    if writer:
+        result["operations_per_batch"] = round(writer.stats()["operations_per_batch"], 1)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--profile", default="development", choices=["development", "production"])
+    args = parser.parse_args()
+
+    # The engine profile is read from the environment when database.database is first imported
+    os.environ["DATABASE_PROFILE"] = args.profile
+    os.environ["DATABASE_ECHO"] = "0"
+    os.environ["LOAN_CACHE_ENABLED"] = "0"
+    os.environ["METRICS_ENABLED"] = "0"
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'unused.db')}"
+        results = [run_mode(mode, directory, args.requests, args.concurrency, args.users) for mode in ("direct", "group_commit")]
+
+    direct, grouped = results
+    print(json.dumps({
+        "profile": args.profile,
+        "concurrency": args.concurrency,
+        "results": results,
+        "speedup": round(grouped["requests_per_second"] / direct["requests_per_second"], 2),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares encode time and bytes on the wire of the schedule response formats:
+the default JSON rows, columnar MessagePack and raw application/octet-stream.
+Encoding starts from a computed schedule, like the endpoint does.
+
+    python -m benchmarks.schedule_encoding --months 360 --repeat 2000
+"""
+import argparse
+import json
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from amortization.calculations import amortization_schedule
+from main import MSGPACK_MEDIA_TYPE, OCTET_STREAM_MEDIA_TYPE, msgpack, packed_schedule_response, schedule_rows
+
+
+def encode_json(schedule, terms):
+    # What schedule_response does for the default format
+    return JSONResponse(jsonable_encoder({"schedule": schedule_rows(*terms, schedule=schedule)})).body
+
+def encode_packed(media_type):
+    def encode(schedule, terms):
+        return packed_schedule_response(media_type, *terms, schedule=schedule).body
+    return encode
+
+def run_format(name: str, encode, months: int, repeat: int) -> dict:
+    terms = (250000.0, 0.065, months)
+    schedule = amortization_schedule(*terms)
+    body = encode(schedule, terms)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        encode(schedule, terms)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "format": name,
+        "months": months,
+        "bytes": len(body),
+        "encode_microseconds": round(elapsed / repeat * 1e6, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=360)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    formats = [("json", encode_json), (OCTET_STREAM_MEDIA_TYPE, encode_packed(OCTET_STREAM_MEDIA_TYPE))]
+    if msgpack is not None:
+        formats.insert(1, (MSGPACK_MEDIA_TYPE, encode_packed(MSGPACK_MEDIA_TYPE)))
+
+    results = [run_format(name, encode, args.months, args.repeat) for name, encode in formats]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Measures p50/p99 latency of GET /v1/users/{user_id}/loans/{loan_id}/schedule
+for a 360-month loan with each way of encoding the JSON body:
+
+    generic         jsonable_encoder + json.dumps, what plain dict endpoints used to get
+    response_model  a dict validated and dumped by the LoanSchedule response model
+    fast            FastJSONResponse, skipping validation and the encoder walk
+
+Requests go through an in-process TestClient against a throwaway SQLite database.
+
+    python -m benchmarks.schedule_latency --requests 2000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def percentile(samples: list, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run_encoder(main, client, encoder: str, months: int, requests: int) -> dict:
+    fast_response = main.schedule_response
+    if encoder == "generic":
+        main.schedule_response = lambda *args: JSONResponse(jsonable_encoder({"schedule": main.schedule_rows(*args)}))
+    elif encoder == "response_model":
+        main.schedule_response = lambda *args: {"schedule": main.schedule_rows(*args)}
+
+    try:
+        url = "/v1/users/1/loans/1/schedule"
+        body = client.get(url).content
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get(url)
+            samples.append(time.perf_counter() - start)
+    finally:
+        main.schedule_response = fast_response
+
+    return {
+        "encoder": encoder,
+        "months": months,
+        "requests": requests,
+        "bytes": len(body),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--months", type=int, default=360)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # The engine is configured from the environment when database.database is imported
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        os.environ["DATABASE_ECHO"] = "0"
+        import main
+        from fastapi.testclient import TestClient
+
+        with TestClient(main.app) as client:
+            client.post("/v1/users", json={"email_address": "bench@test.com"})
+            client.post("/v1/users/1/loans", json={"amount": 250000, "annual_interest_rate": 0.065, "loan_term_in_months": args.months})
+            results = [run_encoder(main, client, encoder, args.months, args.requests) for encoder in ("generic", "response_model", "fast")]
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
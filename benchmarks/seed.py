@@ -0,0 +1,99 @@
+"""
+Seeds an isolated SQLite database with a reproducible volume of users, loans
+and shares for the benchmarks. The same --seed always produces the same rows.
+
+Loan i is owned by user ((i - 1) % users) + 1, so benchmarks can pick an
+authorized (user_id, loan_id) pair without querying.
+
+    python -m benchmarks.seed bench.db --users 10000 --loans 100000
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+
+INSERT_BATCH_SIZE = 10000
+# Rates in 1/8 percent steps, like real quotes, so some loans share terms
+RATES = [round(0.02 + 0.00125 * step, 5) for step in range(57)]
+
+def owner_of(loan_id: int, users: int) -> int:
+    return (loan_id - 1) % users + 1
+
+def seed_database(path: str, users: int = 1000, loans: int = 10000, loan_term_in_months: int = 360, shares_per_loan: float = 0.2, seed: int = 0) -> dict:
+    """Creates a fresh database at path and returns what was seeded."""
+    # Imported here so callers can point DATABASE_URL at the seeded file before
+    # database.database creates the app's engine
+    from database.database import Base, make_engine
+    from database.models import Users, Loans, LoanShares
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    engine = make_engine(f"sqlite:///{path}", "production")
+    engine.echo = False
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    rng = random.Random(seed)
+
+    start = time.perf_counter()
+    with Session() as db:
+        user_rows = [{"email": f"user{user_id}@bench.example.com"} for user_id in range(1, users + 1)]
+        for i in range(0, len(user_rows), INSERT_BATCH_SIZE):
+            db.execute(insert(Users), user_rows[i:i + INSERT_BATCH_SIZE])
+
+        loan_rows = [
+            {
+                "owner_id": owner_of(loan_id, users),
+                "amount": round(rng.uniform(10000, 1000000), 2),
+                "annual_interest_rate": rng.choice(RATES),
+                "loan_term_in_months": loan_term_in_months,
+            }
+            for loan_id in range(1, loans + 1)
+        ]
+        for i in range(0, len(loan_rows), INSERT_BATCH_SIZE):
+            db.execute(insert(Loans), loan_rows[i:i + INSERT_BATCH_SIZE])
+
+        share_rows = set()
+        if users > 1:
+            for _ in range(int(loans * shares_per_loan)):
+                loan_id = rng.randint(1, loans)
+                user_id = rng.randint(1, users)
+                if user_id != owner_of(loan_id, users):
+                    share_rows.add((loan_id, user_id))
+        share_rows = [{"loan_id": loan_id, "user_id": user_id} for loan_id, user_id in sorted(share_rows)]
+        for i in range(0, len(share_rows), INSERT_BATCH_SIZE):
+            db.execute(insert(LoanShares), share_rows[i:i + INSERT_BATCH_SIZE])
+        db.commit()
+
+    engine.dispose()
+    return {
+        "path": path,
+        "users": users,
+        "loans": loans,
+        "shares": len(share_rows),
+        "loan_term_in_months": loan_term_in_months,
+        "seed": seed,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--loans", type=int, default=10000)
+    parser.add_argument("--term-months", type=int, default=360)
+    parser.add_argument("--shares-per-loan", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    add_seed_arguments(parser)
+    args = parser.parse_args()
+
+    print(json.dumps(seed_database(args.path, args.users, args.loans, args.term_months, args.shares_per_loan, args.seed), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Runs the amortization microbenchmarks and the end-to-end endpoint benchmarks
+against a freshly seeded database and writes one JSON report, tagged with the
+git commit, so runs can be compared between commits:
+
+    python -m benchmarks.suite --loans 100000 --output before.json
+    git checkout other-branch
+    python -m benchmarks.suite --loans 100000 --output after.json --baseline before.json
+
+With --baseline, each result also gets a "change" entry: the relative change
+in p50/p99 latency and throughput against the matching result in the baseline.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import time
+
+from benchmarks import amortization_math, endpoints
+from benchmarks.seed import add_seed_arguments
+
+COMPARED_FIELDS = ("p50_us", "p99_us", "p50_ms", "p99_ms", "requests_per_second")
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def relative_change(results: list, baseline: list, key: str):
+    previous = {result[key]: result for result in baseline}
+    for result in results:
+        before = previous.get(result[key])
+        if before is None:
+            continue
+        result["change"] = {
+            field: round(result[field] / before[field] - 1, 4)
+            for field in COMPARED_FIELDS
+            if field in result and before.get(field)
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_seed_arguments(parser)
+    amortization_math.add_math_arguments(parser)
+    endpoints.add_endpoint_arguments(parser)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="report from an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "commit": git_commit(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "amortization": amortization_math.run(args.term_months, args.math_loans, args.math_repeat, args.seed),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        report.update(endpoints.run(
+            directory, args.app, args.users, args.loans, args.term_months, args.shares_per_loan,
+            args.seed, args.requests, args.concurrency, args.endpoint
+        ))
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        report["baseline_commit"] = baseline.get("commit")
+        relative_change(report["amortization"], baseline.get("amortization", []), "case")
+        relative_change(report["endpoints"], baseline.get("endpoints", []), "endpoint")
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Compares loan insert throughput of the development and production engine
+profiles in database/database.py. Each insert is its own commit, like
+create_loan, and writers run on several threads to show lock contention.
+
+    python -m benchmarks.write_throughput --loans 2000 --threads 8
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database.database import Base, make_engine
+from database.models import Users, Loans
+
+
+def run_profile(profile_name: str, loans: int, threads: int) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = make_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}", profile_name)
+        engine.echo = False  # logging would dominate the measurement
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+
+        with Session() as db:
+            db.add(Users(email="bench@test.com"))
+            db.commit()
+
+        def insert_loan(_) -> bool:
+            with Session() as db:
+                try:
+                    db.add(Loans(owner_id=1, amount=1000, annual_interest_rate=0.05, loan_term_in_months=360))
+                    db.commit()
+                    return True
+                except OperationalError:
+                    # "database is locked"; counted rather than retried
+                    db.rollback()
+                    return False
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            succeeded = sum(pool.map(insert_loan, range(loans)))
+        elapsed = time.perf_counter() - start
+
+        engine.dispose()
+        return {
+            "profile": profile_name,
+            "loans": loans,
+            "threads": threads,
+            "locked_errors": loans - succeeded,
+            "seconds": round(elapsed, 4),
+            "inserts_per_second": round(succeeded / elapsed, 1),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--loans", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    results = [run_profile(name, args.loans, args.threads) for name in ("development", "production")]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
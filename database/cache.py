@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+LOAN_CACHE_ENABLED = os.environ.get("LOAN_CACHE_ENABLED", "1").lower() in ("1", "true", "yes")
+
+class LoanRow(NamedTuple):
+    """The loan columns endpoints need, detached from any session so it can be cached."""
+    id: int
+    owner_id: int
+    amount: float
+    annual_interest_rate: float
+    loan_term_in_months: int
+
+    @classmethod
+    def from_model(cls, loan) -> "LoanRow":
+        return cls(loan.id, loan.owner_id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months)
+
+class LoanCache:
+    """
+    Thread-safe TTL + LRU cache of loan rows keyed by loan id, and of access
+    decisions keyed by (user_id, loan_id) for users other than the owner (the
+    owner's access follows from the loan row). Each map holds at most
+    max_entries entries, and entries older than ttl_seconds are treated as
+    missing, which bounds how stale a decision can get if an invalidation is
+    missed (e.g. a write from another process).
+
+    Missing loans are never cached, so a loan id created later is never
+    shadowed by an earlier 404. To avoid caching a decision read before a
+    concurrent share committed, readers pass the invalidation count they saw
+    before querying, and put() drops the entry if any invalidation happened since.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 30.0, enabled: bool = True, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled and max_entries > 0 and ttl_seconds > 0
+        self.clock = clock
+        self._loans = OrderedDict()  # loan_id -> (expires_at, LoanRow)
+        self._access = OrderedDict()  # (user_id, loan_id) -> (expires_at, allowed)
+        self._access_users = {}  # loan_id -> user_ids with an access entry, for invalidate_loan
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int, loan_id: int) -> Optional[Tuple[LoanRow, bool]]:
+        """Returns (loan, allowed) if both are cached and fresh, otherwise None."""
+        if not self.enabled:
+            return None
+
+        now = self.clock()
+        with self._lock:
+            loan = self._fresh(self._loans, loan_id, now)
+            allowed = None
+            if loan is not None:
+                allowed = True if loan.owner_id == user_id else self._fresh(self._access, (user_id, loan_id), now)
+
+            if allowed is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return loan, allowed
+
+    def put(self, user_id: int, loan: LoanRow, allowed: bool, invalidations: Optional[int] = None):
+        if not self.enabled:
+            return
+
+        expires_at = self.clock() + self.ttl_seconds
+        with self._lock:
+            if invalidations is not None and invalidations != self.invalidations:
+                return
+            self._store(self._loans, loan.id, (expires_at, loan))
+            if user_id != loan.owner_id:
+                self._store(self._access, (user_id, loan.id), (expires_at, allowed))
+                self._access_users.setdefault(loan.id, set()).add(user_id)
+            self._evict()
+
+    def put_loan(self, loan: LoanRow):
+        """Primes the cache with a loan that was just created."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._store(self._loans, loan.id, (self.clock() + self.ttl_seconds, loan))
+            self._evict()
+
+    def invalidate_access(self, user_id: int, loan_id: int) -> bool:
+        """Drops the access decision for one user, e.g. after the loan is shared with them."""
+        with self._lock:
+            self.invalidations += 1
+            self._access_users.get(loan_id, set()).discard(user_id)
+            return self._access.pop((user_id, loan_id), None) is not None
+
+    def invalidate_loan(self, loan_id: int) -> bool:
+        """Drops the loan row and every access decision about it."""
+        with self._lock:
+            self.invalidations += 1
+            for user_id in self._access_users.pop(loan_id, ()):
+                self._access.pop((user_id, loan_id), None)
+            return self._loans.pop(loan_id, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._loans.clear()
+            self._access.clear()
+            self._access_users.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "loans": len(self._loans),
+                "access_decisions": len(self._access),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _fresh(self, entries: OrderedDict, key, now: float):
+        entry = entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= now:
+            del entries[key]
+            if entries is self._access:
+                self._access_users.get(key[1], set()).discard(key[0])
+            return None
+        entries.move_to_end(key)
+        return value
+
+    def _store(self, entries: OrderedDict, key, entry):
+        entries[key] = entry
+        entries.move_to_end(key)
+
+    def _evict(self):
+        while len(self._loans) > self.max_entries:
+            self._loans.popitem(last=False)
+            self.evictions += 1
+        while len(self._access) > self.max_entries:
+            (user_id, loan_id), _ = self._access.popitem(last=False)
+            self._access_users.get(loan_id, set()).discard(user_id)
+            self.evictions += 1
+
+loan_cache = LoanCache(
+    max_entries=int(os.environ.get("LOAN_CACHE_MAX_ENTRIES", 10000)),
+    ttl_seconds=float(os.environ.get("LOAN_CACHE_TTL_SECONDS", 30)),
+    enabled=LOAN_CACHE_ENABLED,
+)
@@ -1,13 +1,127 @@
-from sqlalchemy import create_engine
+import os
+
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool, SingletonThreadPool
 
 # Example for SQLite
-DATABASE_URL = "sqlite:///./database.db"
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./database.db")
+# Async driver for main_async.py, e.g. "postgresql+asyncpg://..." in production
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL", "sqlite+aiosqlite:///./database.db")
+# "development" keeps the old behaviour (SQL echo, SQLite defaults), "production" tunes for throughput
+DATABASE_PROFILE = os.environ.get("DATABASE_PROFILE", "development")
+
+ENGINE_PROFILES = {
+    "development": {
+        "echo": True,
+        "pragmas": {},
+        "pool_size": 5,
+        "max_overflow": 10,
+    },
+    "production": {
+        "echo": False,
+        "pragmas": {
+            # WAL lets readers proceed while a writer commits, and NORMAL only fsyncs at checkpoints
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -64000,  # negative means KiB, so 64 MB
+            "mmap_size": 268435456,  # 256 MB
+            "busy_timeout": 5000,  # ms to wait on a locked database instead of failing
+            "temp_store": "MEMORY",
+        },
+        "pool_size": 20,
+        "max_overflow": 20,
+    },
+}
+
+def database_echo(profile: dict) -> bool:
+    echo = os.environ.get("DATABASE_ECHO")
+    if echo is None:
+        return profile["echo"]
+    return echo.lower() in ("1", "true", "yes")
+
+def apply_sqlite_pragmas(engine, pragmas: dict):
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def make_engine(url: str = DATABASE_URL, profile_name: str = DATABASE_PROFILE):
+    """Creates a sync engine configured from one of ENGINE_PROFILES."""
+    profile = ENGINE_PROFILES[profile_name]
+
+    if url.startswith("sqlite") and (":memory:" in url or url in ("sqlite://", "sqlite:///")):
+        # In-memory databases live and die with their connection, so keep one per thread
+        pool_options = {"poolclass": SingletonThreadPool}
+    else:
+        pool_options = {
+            "poolclass": QueuePool,
+            "pool_size": profile["pool_size"],
+            "max_overflow": profile["max_overflow"],
+            "pool_pre_ping": not url.startswith("sqlite"),
+        }
+
+    engine = create_engine(url, echo=database_echo(profile), **pool_options)
+    apply_sqlite_pragmas(engine, profile["pragmas"])
+    return engine
 
-engine = create_engine(DATABASE_URL, echo=True)
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
+# FastAPI dependency yielding one session per request
+def get_db():
+    with SessionLocal() as db:
+        yield db
+
+# The async engine is created on first use so the sync app doesn't need aiosqlite installed
+async_engine = None
+AsyncSessionLocal = None
+
+def get_async_sessionmaker():
+    global async_engine, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+        profile = ENGINE_PROFILES[DATABASE_PROFILE]
+        async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=database_echo(profile))
+        apply_sqlite_pragmas(async_engine.sync_engine, profile["pragmas"])
+        AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+    return AsyncSessionLocal
+
+# FastAPI dependency yielding one async session per request
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    create_missing_indexes()
+    migrate_shared_with()
+
+# create_all skips tables that already exist, so add indexes declared since
+def create_missing_indexes():
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+# Move the legacy loans.shared_with JSON lists into the loan_shares table.
+# Migrated lists are cleared so this is safe to run on every startup.
+def migrate_shared_with():
+    columns = [column["name"] for column in inspect(engine).get_columns("loans")]
+    if "shared_with" not in columns:
+        return
+
+    with engine.begin() as connection:
+        connection.execute(text(
+            "INSERT OR IGNORE INTO loan_shares (loan_id, user_id) "
+            "SELECT loans.id, json_each.value FROM loans, json_each(loans.shared_with) "
+            "WHERE loans.shared_with IS NOT NULL"
+        ))
+        connection.execute(text("UPDATE loans SET shared_with = NULL WHERE shared_with IS NOT NULL"))
@@ -0,0 +1,150 @@
+"""
+Optional group commit for small writes. Under bursty load every create_loan
+or share_loan used to commit on its own, and with SQLite each commit takes
+the database write lock (and, outside WAL, syncs the journal), so concurrent
+writers queue up on the lock or fail with "database is locked".
+
+With GROUP_COMMIT=1, endpoints hand their writes to a single writer thread
+as operations, callables that take a Session and return a result (e.g. the
+new loan id). The writer runs every operation queued within
+GROUP_COMMIT_MAX_DELAY_MS (default 2) of the first one, up to
+GROUP_COMMIT_MAX_BATCH (default 256), in one transaction and commits once.
+Each caller blocks on a Future that resolves after the commit, so results
+are only seen once they are durable.
+
+If anything in a batch raises, the batch is rolled back and its operations
+rerun one transaction each, so only the failing operation's caller gets the
+exception.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, TypeVar
+
+from database.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+GROUP_COMMIT = os.environ.get("GROUP_COMMIT", "0").lower() in ("1", "true", "yes")
+
+T = TypeVar("T")
+
+class GroupCommitWriter:
+    def __init__(self, session_factory=SessionLocal, max_batch: int = 256, max_delay_seconds: float = 0.002):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_delay_seconds = max_delay_seconds
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.operations = 0
+        self.retried_batches = 0
+
+    def submit(self, operation: Callable[..., T]) -> "Future[T]":
+        """Queues operation(session) for the next batch and returns its Future."""
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((operation, future))
+        return future
+
+    def run(self, operation: Callable[..., T]) -> T:
+        """Submits operation and waits for its committed result, re-raising its exception."""
+        return self.submit(operation).result()
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Commits whatever is queued, then stops the writer thread."""
+        with self._start_lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "operations": self.operations,
+            "operations_per_batch": self.operations / self.batches if self.batches else 0.0,
+            "retried_batches": self.retried_batches,
+        }
+
+    def _next_batch(self):
+        """Blocks for the first operation, then gathers more for up to max_delay_seconds. Returns (batch, stopping)."""
+        item = self._queue.get()
+        if item is None:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.max_delay_seconds
+        while len(batch) < self.max_batch:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self._next_batch()
+            # Callers that gave up (cancelled futures) are skipped
+            batch = [(operation, future) for operation, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    logger.exception("Group commit failed")
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+
+    def _commit(self, batch):
+        with self.session_factory() as db:
+            try:
+                results = [operation(db) for operation, _ in batch]
+                db.commit()
+            except Exception:
+                db.rollback()
+                results = None
+
+        if results is None:
+            self.retried_batches += 1
+            for operation, future in batch:
+                self._commit_one(operation, future)
+        else:
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+        self.batches += 1
+        self.operations += len(batch)
+
+    def _commit_one(self, operation, future: Future):
+        with self.session_factory() as db:
+            try:
+                result = operation(db)
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                future.set_exception(e)
+                return
+        future.set_result(result)
+
+group_commit_writer = GroupCommitWriter(
+    max_batch=int(os.environ.get("GROUP_COMMIT_MAX_BATCH", 256)),
+    max_delay_seconds=float(os.environ.get("GROUP_COMMIT_MAX_DELAY_MS", 2)) / 1000,
+) if GROUP_COMMIT else None
@@ -0,0 +1,146 @@
+"""
+Cross-process invalidation of the in-process loan cache (database/cache.py).
+
+Under several uvicorn workers each process has its own loan_cache, so a
+share made in one worker would otherwise only reach the others when their
+entries expire. Endpoints that change access rights add an invalidation
+statement to their own transaction (channel.statement()), and invalidate
+their own process's cache after committing as before.
+
+Channels, picked with CACHE_INVALIDATION:
+
+    changelog   (default) rows in the cache_invalidations table, committed
+                atomically with the change. Every worker polls the table every
+                INVALIDATION_POLL_SECONDS (default 0.5) on a background thread
+                and applies rows it hasn't seen, so other workers drop
+                affected entries within about one poll interval. Rows older
+                than INVALIDATION_RETENTION_SECONDS (default 3600) are pruned;
+                a worker whose last successful poll is older than that clears
+                its whole cache instead, as it may have missed pruned rows.
+    local       a single process; nothing is published or polled.
+
+This relies on SQLite committing one writer at a time, so ids become visible
+in order. Schedule caches are keyed by loan terms, which never change, so
+they need no invalidation.
+"""
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy.orm import sessionmaker
+
+from database.cache import LoanCache, loan_cache
+from database.database import DATABASE_URL, make_engine
+from database import queries
+
+logger = logging.getLogger(__name__)
+
+CACHE_INVALIDATION = os.environ.get("CACHE_INVALIDATION", "changelog")
+INVALIDATION_POLL_SECONDS = float(os.environ.get("INVALIDATION_POLL_SECONDS", 0.5))
+INVALIDATION_RETENTION_SECONDS = float(os.environ.get("INVALIDATION_RETENTION_SECONDS", 3600))
+
+class LocalInvalidation:
+    """Single process channel: endpoints invalidate their own cache and nothing else happens."""
+    def __init__(self, cache: LoanCache = loan_cache):
+        self.cache = cache
+
+    def statement(self, loan_id: int, user_id=None):
+        """Statement publishing the invalidation, to run in the writer's transaction; None if there is nothing to publish."""
+        return None
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+class ChangeLogInvalidation(LocalInvalidation):
+    def __init__(self, cache: LoanCache = loan_cache, session_factory=None, poll_seconds: float = INVALIDATION_POLL_SECONDS, retention_seconds: float = INVALIDATION_RETENTION_SECONDS, clock=time.time):
+        super().__init__(cache)
+        self.session_factory = session_factory
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.clock = clock
+        self.last_id = None
+        self.last_poll = None
+        self.last_prune = 0.0
+        self.applied = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def statement(self, loan_id: int, user_id=None):
+        return queries.insert_cache_invalidation(loan_id, user_id, self.clock())
+
+    def start(self):
+        """Starts polling from the newest row; this process's cache holds nothing older yet."""
+        if self.session_factory is None:
+            # Its own quiet engine, so polling doesn't flood the development profile's SQL echo
+            engine = make_engine(DATABASE_URL)
+            engine.echo = False
+            self.session_factory = sessionmaker(bind=engine)
+        with self.session_factory() as db:
+            self.last_id = db.execute(queries.latest_cache_invalidation_id()).scalar()
+        self.last_poll = self.clock()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def poll(self) -> int:
+        """Applies every row newer than the last one seen. Returns the number applied."""
+        now = self.clock()
+        with self.session_factory() as db:
+            rows = db.execute(queries.cache_invalidations_after(self.last_id)).all()
+
+            if now - self.last_poll > self.retention_seconds:
+                # Rows we never saw may have been pruned already
+                self.cache.clear()
+            for row_id, loan_id, user_id in rows:
+                if user_id is None:
+                    self.cache.invalidate_loan(loan_id)
+                else:
+                    self.cache.invalidate_access(user_id, loan_id)
+                self.last_id = row_id
+
+            if now - self.last_prune > self.retention_seconds / 10:
+                db.execute(queries.prune_cache_invalidations(now - self.retention_seconds))
+                db.commit()
+                self.last_prune = now
+
+        self.last_poll = now
+        self.applied += len(rows)
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "applied": self.applied,
+            "errors": self.errors,
+            "lag_seconds": self.clock() - self.last_poll if self.last_poll is not None else 0.0,
+        }
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception:
+                self.errors += 1
+                logger.exception("Failed to poll cache invalidations")
+
+INVALIDATION_CHANNELS = {
+    "changelog": ChangeLogInvalidation,
+    "local": LocalInvalidation,
+}
+
+invalidation_channel = INVALIDATION_CHANNELS[CACHE_INVALIDATION]()
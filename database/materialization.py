@@ -0,0 +1,104 @@
+"""
+Optional precomputed schedules. When enabled, each loan's amortization arrays
+are packed into a loan_schedules BLOB by a background worker pool, so schedule
+reads become a single indexed lookup instead of a recomputation. Loans are
+enqueued at creation time and a backfill job catches up existing loans; until
+a row exists the read path falls back to computing on the fly.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from sqlalchemy import insert
+
+from amortization.calculations import Schedule, amortization_schedule
+from database.database import SessionLocal
+from database.models import LoanSchedules
+from database import queries
+
+logger = logging.getLogger(__name__)
+
+MATERIALIZE_SCHEDULES = os.environ.get("MATERIALIZE_SCHEDULES", "0").lower() in ("1", "true", "yes")
+MATERIALIZE_WORKERS = int(os.environ.get("MATERIALIZE_WORKERS", 2))
+BACKFILL_BATCH_SIZE = 500
+
+def pack_schedule(schedule: Schedule) -> bytes:
+    # The monthly payment once as a float64 header, then one float64 row per Schedule array
+    return np.float64(schedule.monthly_payment).tobytes() + np.stack(schedule[1:]).astype(np.float64).tobytes()
+
+def unpack_schedule(arrays: bytes) -> Schedule:
+    packed = np.frombuffer(arrays, dtype=np.float64)
+    return Schedule(float(packed[0]), *packed[1:].reshape(len(Schedule._fields) - 1, -1))
+
+class ScheduleMaterializer:
+    def __init__(self, session_factory=SessionLocal, workers: int = MATERIALIZE_WORKERS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="materialize")
+        self._backfill_lock = threading.Lock()
+
+    def materialize(self, loans) -> int:
+        """
+        Computes and stores schedules for (loan_id, amount, annual_interest_rate,
+        loan_term_in_months) tuples. Loans with identical terms share one
+        computation. Returns the number of rows written.
+        """
+        packed = {}
+        rows = []
+        for loan_id, amount, annual_interest_rate, loan_term_in_months in loans:
+            terms = (amount, annual_interest_rate, loan_term_in_months)
+            if terms not in packed:
+                packed[terms] = pack_schedule(amortization_schedule(*terms))
+            rows.append({"loan_id": loan_id, "loan_term_in_months": loan_term_in_months, "arrays": packed[terms]})
+
+        if not rows:
+            return 0
+
+        with self.session_factory() as db:
+            # another worker may have beaten us to some rows, which is fine
+            db.execute(insert(LoanSchedules).prefix_with("OR IGNORE", dialect="sqlite"), rows)
+            db.commit()
+        return len(rows)
+
+    def enqueue(self, loans):
+        """Materializes loans in the background; returns the Future."""
+        return self.executor.submit(self._materialize_logged, list(loans))
+
+    def backfill(self) -> int:
+        """Materializes every loan without a schedule row, in batches across the pool."""
+        with self._backfill_lock:
+            total = 0
+            while True:
+                with self.session_factory() as db:
+                    loans = db.execute(queries.unmaterialized_loans(BACKFILL_BATCH_SIZE * self.workers)).all()
+                if not loans:
+                    return total
+
+                batches = [loans[i:i + BACKFILL_BATCH_SIZE] for i in range(0, len(loans), BACKFILL_BATCH_SIZE)]
+                total += sum(self.executor.map(self.materialize, batches))
+
+    def start_backfill(self):
+        # Runs on its own thread so it can fan batches out to the pool without deadlocking it
+        thread = threading.Thread(target=self._backfill_logged, name="materialize-backfill", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+    def _materialize_logged(self, loans) -> int:
+        try:
+            return self.materialize(loans)
+        except Exception:
+            logger.exception("Failed to materialize schedules")
+            return 0
+
+    def _backfill_logged(self):
+        try:
+            self.backfill()
+        except Exception:
+            logger.exception("Failed to backfill schedules")
+
+schedule_materializer = ScheduleMaterializer() if MATERIALIZE_SCHEDULES else None
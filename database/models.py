@@ -1,7 +1,6 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, Index, LargeBinary
 from database.database import Base
 from sqlalchemy.orm import relationship
-from sqlalchemy.ext.mutable import MutableList
 
 
 class Users(Base):
@@ -22,4 +21,41 @@ class Loans(Base):
     amount = Column(Float)
     annual_interest_rate = Column(Float)
     loan_term_in_months = Column(Integer)
-    shared_with = Column(MutableList.as_mutable(JSON), default=[])
\ No newline at end of file
+    shares = relationship("LoanShares", back_populates="loan")
+
+    # serves keyset pagination of a user's loans
+    __table_args__ = (
+        Index("ix_loans_owner_id_id", "owner_id", "id"),
+    )
+
+class LoanShares(Base):
+    __tablename__ = "loan_shares"
+
+    # composite primary key serves lookups by loan, the reverse index serves lookups by user
+    loan_id = Column(Integer, ForeignKey("loans.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    loan = relationship("Loans", back_populates="shares")
+
+    __table_args__ = (
+        Index("ix_loan_shares_user_id_loan_id", "user_id", "loan_id"),
+    )
+
+class LoanSchedules(Base):
+    __tablename__ = "loan_schedules"
+
+    # precomputed amortization arrays for a loan, see database/materialization.py
+    loan_id = Column(Integer, ForeignKey("loans.id"), primary_key=True)
+    loan_term_in_months = Column(Integer)
+    arrays = Column(LargeBinary)
+
+class CacheInvalidations(Base):
+    __tablename__ = "cache_invalidations"
+
+    # change log every worker process polls to drop stale cache entries, see database/invalidation.py
+    id = Column(Integer, primary_key=True)
+    loan_id = Column(Integer)
+    user_id = Column(Integer, nullable=True)  # NULL drops the whole loan
+    created_at = Column(Float)
+
+    # AUTOINCREMENT so ids never go backwards once old rows are pruned
+    __table_args__ = {"sqlite_autoincrement": True}
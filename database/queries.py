@@ -0,0 +1,154 @@
+"""
+Consolidated data-access statements. Each builder returns a single statement
+that answers everything an endpoint needs in one round-trip, and works with
+both the sync Session (main.py) and the AsyncSession (main_async.py).
+"""
+from typing import List, Optional
+
+from sqlalchemy import delete, exists, func, insert, literal, or_, select, true, union
+
+from database.models import Users, Loans, LoanShares, LoanSchedules, CacheInvalidations
+
+def insert_user(email: str):
+    return insert(Users).values(email=email).returning(Users.id)
+
+def insert_loan_for_existing_user(user_id: int, amount: float, annual_interest_rate: float, loan_term_in_months: int):
+    # INSERT ... SELECT ... WHERE EXISTS inserts nothing (and returns no id) if the user is missing
+    owner_exists = exists().where(Users.id == user_id)
+    return insert(Loans).from_select(
+        ["owner_id", "amount", "annual_interest_rate", "loan_term_in_months"],
+        select(
+            literal(user_id),
+            literal(amount),
+            literal(annual_interest_rate),
+            literal(loan_term_in_months),
+        ).where(owner_exists)
+    ).returning(Loans.id)
+
+def owned_loan_ids_page(user_id: int, limit: int, offset: int = 0, after_id: Optional[int] = None):
+    """
+    One page of a user's loan ids, left joined onto the user row so a missing
+    user (no rows) can be told apart from a user without loans (one NULL row).
+    Keyset pagination is used when after_id is given, offset otherwise.
+    """
+    page = select(Loans.id, Loans.owner_id).where(Loans.owner_id == user_id).order_by(Loans.id)
+    if after_id is not None:
+        page = page.where(Loans.id > after_id).limit(limit)
+    else:
+        page = page.offset(offset).limit(limit)
+    page = page.subquery()
+
+    return (
+        select(Users.id, page.c.id)
+        .outerjoin(page, page.c.owner_id == Users.id)
+        .where(Users.id == user_id)
+        .order_by(page.c.id)
+    )
+
+def shared_loan_ids_page(user_id: int, limit: int, offset: int = 0):
+    """Like owned_loan_ids_page, for loans shared with the user."""
+    page = (
+        select(LoanShares.loan_id, LoanShares.user_id)
+        .where(LoanShares.user_id == user_id)
+        .order_by(LoanShares.loan_id)
+        .offset(offset)
+        .limit(limit)
+        .subquery()
+    )
+
+    return (
+        select(Users.id, page.c.loan_id)
+        .outerjoin(page, page.c.user_id == Users.id)
+        .where(Users.id == user_id)
+        .order_by(page.c.loan_id)
+    )
+
+def page_loan_ids(rows) -> Optional[List[int]]:
+    """Unpacks a *_loan_ids_page result: None if the user doesn't exist, else the loan ids."""
+    if not rows:
+        return None
+    return [loan_id for _, loan_id in rows if loan_id is not None]
+
+def portfolio_loans(user_id: int):
+    """
+    Terms of every loan the user owns or has shared with them, left joined
+    onto the user row so a missing user returns no rows.
+    """
+    loan_columns = (Loans.id, Loans.amount, Loans.annual_interest_rate, Loans.loan_term_in_months)
+    loans = union(
+        select(*loan_columns).where(Loans.owner_id == user_id),
+        select(*loan_columns).join(LoanShares, LoanShares.loan_id == Loans.id).where(LoanShares.user_id == user_id),
+    ).subquery()
+
+    return (
+        select(Users.id.label("user_id"), loans)
+        .outerjoin(loans, true())
+        .where(Users.id == user_id)
+        .order_by(loans.c.id)
+    )
+
+def loan_with_access(loan_id: int, user_id: int):
+    """
+    The loan row, whether user_id owns it or has it shared with them, and its
+    materialized schedule arrays (None until materialized).
+    """
+    is_shared = exists().where(LoanShares.loan_id == Loans.id, LoanShares.user_id == user_id)
+    return (
+        select(Loans, or_(Loans.owner_id == user_id, is_shared).label("allowed"), LoanSchedules.arrays)
+        .outerjoin(LoanSchedules, LoanSchedules.loan_id == Loans.id)
+        .where(Loans.id == loan_id)
+    )
+
+def loans_with_access(loan_ids, user_id: int):
+    """Like loan_with_access for many loans in one IN query."""
+    is_shared = exists().where(LoanShares.loan_id == Loans.id, LoanShares.user_id == user_id)
+    return (
+        select(Loans, or_(Loans.owner_id == user_id, is_shared).label("allowed"), LoanSchedules.arrays)
+        .outerjoin(LoanSchedules, LoanSchedules.loan_id == Loans.id)
+        .where(Loans.id.in_(loan_ids))
+    )
+
+def unmaterialized_loans(limit: int):
+    """Terms of loans that don't have a loan_schedules row yet."""
+    return (
+        select(Loans.id, Loans.amount, Loans.annual_interest_rate, Loans.loan_term_in_months)
+        .outerjoin(LoanSchedules, LoanSchedules.loan_id == Loans.id)
+        .where(LoanSchedules.loan_id.is_(None))
+        .order_by(Loans.id)
+        .limit(limit)
+    )
+
+def loan_shares_with_target(loan_id: int, shared_with_user_id: int):
+    """
+    One row per existing share of the loan (or a single row with a NULL
+    user_id if there are none), plus whether the share target user exists.
+    """
+    target_exists = exists().where(Users.id == shared_with_user_id)
+    return (
+        select(Loans.id, Loans.owner_id, LoanShares.user_id, target_exists.label("target_exists"))
+        .outerjoin(LoanShares, LoanShares.loan_id == Loans.id)
+        .where(Loans.id == loan_id)
+        .order_by(LoanShares.user_id)
+    )
+
+def insert_loan_share(loan_id: int, user_id: int):
+    return insert(LoanShares).values(loan_id=loan_id, user_id=user_id)
+
+def delete_loan_share(loan_id: int, user_id: int):
+    return delete(LoanShares).where(LoanShares.loan_id == loan_id, LoanShares.user_id == user_id)
+
+def insert_cache_invalidation(loan_id: int, user_id: Optional[int], created_at: float):
+    return insert(CacheInvalidations).values(loan_id=loan_id, user_id=user_id, created_at=created_at)
+
+def cache_invalidations_after(last_id: int):
+    return (
+        select(CacheInvalidations.id, CacheInvalidations.loan_id, CacheInvalidations.user_id)
+        .where(CacheInvalidations.id > last_id)
+        .order_by(CacheInvalidations.id)
+    )
+
+def latest_cache_invalidation_id():
+    return select(func.coalesce(func.max(CacheInvalidations.id), 0))
+
+def prune_cache_invalidations(created_before: float):
+    return delete(CacheInvalidations).where(CacheInvalidations.created_at < created_before)
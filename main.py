@@ -1,22 +1,72 @@
-from typing import Union
-from pydantic import BaseModel
-from fastapi import FastAPI
+from typing import List, Optional, Tuple, Union
+from pydantic import BaseModel, Field
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi import status
 from fastapi import HTTPException
 from pydantic import EmailStr
 
-from database.database import SessionLocal, create_tables
+from database.database import create_tables, get_db
 from database.models import Users, Loans
+from database import queries
+from database.materialization import schedule_materializer, unpack_schedule
+from amortization.calculations import Schedule, amortization_schedule, balances_between, closed_form_is_exact, monthly_payment, month_summary, portfolio_month_summaries
+from amortization.cache import cents_schedule_caches, schedule_cache
+from amortization.checkpoints import summary_checkpoints
+from amortization.shared_store import shared_schedule_store
+from amortization.cents import ROUNDING_POLICIES
+from amortization.scenarios import evaluate_scenarios, scenario_arrays
+from database.cache import LoanRow, loan_cache
+from database.group_commit import group_commit_writer
+from database.invalidation import invalidation_channel
+from metrics import PROMETHEUS_MEDIA_TYPE, compute_timer, instrument, registry, stats_collector
+from sqlalchemy import insert, select
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
-import math
+import base64
+import binascii
+import json
+import struct
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 app = FastAPI()
+instrument(app)
+registry.add_collector(stats_collector("loan_cache", loan_cache.stats))
+registry.add_collector(stats_collector("schedule_cache", schedule_cache.stats))
+registry.add_collector(stats_collector("cache_invalidation", invalidation_channel.stats))
+if shared_schedule_store:
+    registry.add_collector(stats_collector("shared_schedule_store", shared_schedule_store.stats))
+if group_commit_writer:
+    registry.add_collector(stats_collector("group_commit", group_commit_writer.stats))
+if summary_checkpoints:
+    registry.add_collector(stats_collector("summary_checkpoints", summary_checkpoints.stats))
 
 # Initialize database tables on startup
 @app.on_event("startup")
 def startup_event():
     create_tables()
+    invalidation_channel.start()
+    if group_commit_writer:
+        group_commit_writer.start()
+    if schedule_materializer:
+        schedule_materializer.start_backfill()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    if group_commit_writer:
+        group_commit_writer.stop()
+    invalidation_channel.stop()
 
 """
 SCHEMAS
@@ -29,311 +79,1115 @@ class LoanCreate(BaseModel):
     annual_interest_rate: float
     loan_term_in_months: int
 
+MAX_BATCH_SIZE = 10000
+STREAM_CHUNK_MONTHS = 1024
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+OCTET_STREAM_MEDIA_TYPE = "application/octet-stream"
+# from_month, step, count, monthly_payment_cents
+PACKED_SCHEDULE_HEADER = struct.Struct("<iiiq")
+
+class UserBatchCreate(BaseModel):
+    users: List[UserCreate] = Field(max_length=MAX_BATCH_SIZE)
+
+class LoanBatchCreate(BaseModel):
+    loans: List[LoanCreate] = Field(max_length=MAX_BATCH_SIZE)
+
+class ScheduleRequest(BaseModel):
+    loan_id: int
+    from_month: Optional[int] = None
+    to_month: Optional[int] = None
+    step: int = 1
+
+class ScheduleBatchRequest(BaseModel):
+    loans: List[ScheduleRequest] = Field(max_length=MAX_BATCH_SIZE)
+
+class LumpSum(BaseModel):
+    month: int
+    amount: float = Field(ge=0)
+
+class RateChange(BaseModel):
+    month: int
+    annual_interest_rate: float = Field(ge=0)
+
+class Scenario(BaseModel):
+    name: Optional[str] = None
+    extra_monthly_principal: float = Field(default=0, ge=0)
+    lump_sums: List[LumpSum] = []
+    rate_changes: List[RateChange] = []
+
+class ScenarioBatchRequest(BaseModel):
+    scenarios: List[Scenario] = Field(max_length=MAX_BATCH_SIZE)
+    include_schedules: bool = False
+
+class UserCreated(BaseModel):
+    user_id: int
+
+class BatchItemError(BaseModel):
+    error: str
+
+class UserBatchCreated(BaseModel):
+    users: List[Union[UserCreated, BatchItemError]]
+
+class LoanCreated(BaseModel):
+    loan_id: int
+    owner_id: int
+    amount: float
+    annual_interest_rate: float
+    loan_term_in_months: int
+
+class LoanBatchCreated(BaseModel):
+    loans: List[Union[LoanCreated, BatchItemError]]
+
+class LoanId(BaseModel):
+    loan_id: int
+
+class LoanPage(BaseModel):
+    loans: List[LoanId]
+    # offset pages return offset, cursor pages return next_cursor
+    offset: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+class SharedWith(BaseModel):
+    user_ids: List[int]
+
+class LoanShared(BaseModel):
+    loan_id: int
+    shared_with: SharedWith
+
+class ScheduleRow(BaseModel):
+    month: int
+    monthly_payment: float
+    remaining_balance: float
+
+class ExactScheduleRow(ScheduleRow):
+    principal: float
+    interest: float
+
+class LoanSchedule(BaseModel):
+    # ?exact=1 returns ExactScheduleRow rows
+    schedule: List[Union[ExactScheduleRow, ScheduleRow]]
+
+class LoanScheduleResult(BaseModel):
+    loan_id: int
+    schedule: Optional[List[ScheduleRow]] = None
+    error: Optional[str] = None
+
+class LoanScheduleBatch(BaseModel):
+    schedules: List[LoanScheduleResult]
+
+class ScenarioRow(BaseModel):
+    month: int
+    payment: float
+    principal: float
+    interest: float
+    remaining_balance: float
+
+class ScenarioOutcome(BaseModel):
+    payoff_month: int
+    total_interest: float
+    total_paid: float
+
+class ScenarioResult(ScenarioOutcome):
+    name: Optional[str] = None
+    months_saved: int
+    interest_saved: float
+    schedule: Optional[List[ScenarioRow]] = None
+
+class ScenarioBatch(BaseModel):
+    loan_id: int
+    baseline: ScenarioOutcome
+    scenarios: List[ScenarioResult]
+
+class MonthSummary(BaseModel):
+    loan_id: int
+    month: int
+    principal_balance: float
+    aggregate_principal_paid: float
+    aggregate_interest_paid: float
+
+class PortfolioLoan(MonthSummary):
+    total_interest: float
+
+class PortfolioTotals(BaseModel):
+    loan_count: int
+    principal_balance: float
+    aggregate_principal_paid: float
+    aggregate_interest_paid: float
+    total_interest: float
+
+class Portfolio(BaseModel):
+    user_id: int
+    month: int
+    loans: List[PortfolioLoan]
+    totals: PortfolioTotals
+
 """
-ENDPOINTS
+RESPONSES
 """
-@app.post("/v1/users", status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate):
-    with SessionLocal() as db:
-        try:
-            new_user = Users(email=user.email_address)
-            db.add(new_user)
-            db.commit()
-            db.refresh(new_user)
-            return {"user_id": new_user.id}
-        except IntegrityError:
-            db.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="Email already exists"
-            )
+# orjson writes exponents as 1e16 where json.dumps writes 1e+16, so payloads
+# with larger amounts go through json.dumps to keep the output byte-identical
+ORJSON_MAX_AMOUNT = 1e16
 
-@app.post("/v1/users/{user_id}/loans", status_code=status.HTTP_201_CREATED)
-def create_loan(user_id: int, loan: LoanCreate):
-    with SessionLocal() as db:
-        # Validate loan parameters first
-        if loan.amount <= 0 or loan.annual_interest_rate < 0 or loan.loan_term_in_months <= 0:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail="Invalid loan parameters"
-            )
+def orjson_safe(*amounts: float) -> bool:
+    return all(amount < ORJSON_MAX_AMOUNT for amount in amounts)
 
-        user = None
-        try:
-            # Check if user exists
-            user = db.query(Users).filter(Users.id == user_id).first()
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}"
-            )
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse for large payloads that are already plain dicts, lists, ints
+    and floats. Returned directly from the endpoint, so FastAPI skips both the
+    response model validation and the jsonable_encoder walk, and rendered with
+    orjson when it is installed. The bytes match JSONResponse.
+    """
+    def __init__(self, content, *args, use_orjson: bool = True, **kwargs):
+        self.use_orjson = use_orjson and orjson is not None
+        super().__init__(content, *args, **kwargs)
 
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {user_id} not found"
-            )
+    def render(self, content) -> bytes:
+        if self.use_orjson:
+            return orjson.dumps(content)
+        return super().render(content)
+
+"""
+HELPERS
+"""
+def valid_loan_parameters(loan: LoanCreate) -> bool:
+    return loan.amount > 0 and loan.annual_interest_rate >= 0 and loan.loan_term_in_months > 0
 
-        # Create loan
-        new_loan = Loans(
-            owner_id=user_id,
-            amount=loan.amount,
-            annual_interest_rate=loan.annual_interest_rate,
-            loan_term_in_months=loan.loan_term_in_months
+def encode_cursor(loan_id: int) -> str:
+    return base64.urlsafe_b64encode(str(loan_id).encode()).decode()
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid cursor"
         )
 
-        try:
-            db.add(new_loan)
-            db.commit()
-            db.refresh(new_loan)
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}"
-            )
+def cached_authorized_loan(user_id: int, loan_id: int) -> Optional[LoanRow]:
+    # Loan row and access decision from the loan cache, or None on a miss
+    cached = loan_cache.get(user_id, loan_id)
+    if cached is None:
+        return None
 
-        return {
-            "loan_id": new_loan.id,
-            "owner_id": new_loan.owner_id,
-            "amount": new_loan.amount,
-            "annual_interest_rate": new_loan.annual_interest_rate,
-            "loan_term_in_months": new_loan.loan_term_in_months
-        }
+    loan, allowed = cached
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Loan is not shared with user"
+        )
+    return loan
 
-@app.get("/v1/users/{user_id}/loans")
-def get_loans(user_id: int, limit: int = 10, offset: int = 0):
-    with SessionLocal() as db:
-        user = None
-        try:
-            # Check if user exists
-            user = db.query(Users).filter(Users.id == user_id).first()
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}"
-            )
+def authorize_loan_row(user_id: int, loan_id: int, row, invalidations: int) -> Tuple[LoanRow, Optional[Schedule]]:
+    # Checks a queries.loan_with_access row and caches the outcome
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Loan with id {loan_id} not found"
+        )
 
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {user_id} not found"
-            )
+    model, allowed, arrays = row
+    loan = LoanRow.from_model(model)
+    loan_cache.put(user_id, loan, allowed, invalidations)
 
-        # Fetch loans
-        loans = None
-        try:
-            loans = db.query(Loans).filter(Loans.owner_id == user_id).offset(offset).limit(limit).all()
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}"
-            )
+    # Authorization check
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Loan is not shared with user"
+        )
 
-        loans_list = [{"loan_id": loan.id} for loan in loans]
+    schedule = None
+    if arrays:
+        # Keep the materialized schedule around for requests served from the loan cache
+        schedule = unpack_schedule(arrays)
+        schedule_cache.put(loan.amount, loan.annual_interest_rate, loan.loan_term_in_months, schedule)
+    return loan, schedule
 
-        return {
-            "loans": loans_list, 
-            "offset": offset + len(loans_list),
+def fetch_authorized_loan(db: Session, user_id: int, loan_id: int) -> Tuple[LoanRow, Optional[Schedule]]:
+    loan = cached_authorized_loan(user_id, loan_id)
+    if loan is not None:
+        # Any schedule is picked up from the schedule cache
+        return loan, None
+
+    # Loan row, access check and materialized schedule in a single statement
+    invalidations = loan_cache.invalidations
+    row = None
+    try:
+        row = db.execute(queries.loan_with_access(loan_id, user_id)).first()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    return authorize_loan_row(user_id, loan_id, row, invalidations)
+
+def commit_write(db: Session, operation):
+    # Runs operation(session) and commits it, batched with concurrent writes by the group commit writer when enabled
+    if group_commit_writer:
+        return group_commit_writer.run(operation)
+    result = operation(db)
+    db.commit()
+    return result
+
+def write_share_change(session: Session, statement, loan_id: int, shared_with_user_id: int):
+    session.execute(statement)
+    # Other worker processes drop their cached decision once this commits
+    invalidation = invalidation_channel.statement(loan_id, shared_with_user_id)
+    if invalidation is not None:
+        session.execute(invalidation)
+
+def cache_created_loans(loans):
+    # (loan_id, owner_id, amount, annual_interest_rate, loan_term_in_months) tuples
+    for loan in loans:
+        loan = LoanRow(*loan)
+        loan_cache.invalidate_loan(loan.id)
+        loan_cache.put_loan(loan)
+
+def enqueue_materialization(loans):
+    # (loan_id, amount, annual_interest_rate, loan_term_in_months) tuples
+    if schedule_materializer and loans:
+        schedule_materializer.enqueue(loans)
+
+def month_range_error(loan_term_in_months: int, from_month: int, to_month: int, step: int) -> Optional[str]:
+    if not 1 <= from_month <= to_month <= loan_term_in_months:
+        return f"Month must be between 1 and {loan_term_in_months}"
+    if step < 1:
+        return "Step must be at least 1"
+    return None
+
+def compute_schedule(amount: float, annual_interest_rate: float, loan_term_in_months: int) -> Schedule:
+    # With the shared store on, one copy serves every worker instead of one per process;
+    # terms the store can't hold (longer than its max_months) still go to this process's cache
+    schedule = amortization_schedule(amount, annual_interest_rate, loan_term_in_months)
+    if not (shared_schedule_store and shared_schedule_store.put(amount, annual_interest_rate, loan_term_in_months, schedule)):
+        schedule_cache.put(amount, annual_interest_rate, loan_term_in_months, schedule)
+    return schedule
+
+def schedule_balances(amount: float, annual_interest_rate: float, loan_term_in_months: int, from_month: int = 1, to_month: Optional[int] = None, step: int = 1, schedule: Optional[Schedule] = None) -> np.ndarray:
+    """
+    Unrounded balances for every step-th month from from_month to to_month,
+    from the schedule cache or the shared store when either has the terms. On
+    a miss a full schedule is computed (and stored); a partial one is computed
+    for just the requested months.
+    """
+    if to_month is None:
+        to_month = loan_term_in_months
+    terms = (amount, annual_interest_rate, loan_term_in_months)
+
+    with compute_timer():
+        if schedule is None:
+            schedule = schedule_cache.peek(*terms)
+        if schedule is None and shared_schedule_store:
+            balances = shared_schedule_store.balances(*terms, from_month, to_month, step)
+            if balances is not None:
+                return balances
+        if schedule is None and (from_month, to_month, step) == (1, loan_term_in_months, 1):
+            schedule = compute_schedule(*terms)
+
+        if schedule is not None:
+            return schedule.balances[from_month - 1:to_month:step]
+        return balances_between(*terms, from_month, to_month, step)
+
+def schedule_rows(amount: float, annual_interest_rate: float, loan_term_in_months: int, from_month: int = 1, to_month: Optional[int] = None, step: int = 1, schedule: Optional[Schedule] = None) -> list:
+    if to_month is None:
+        to_month = loan_term_in_months
+    balances = schedule_balances(amount, annual_interest_rate, loan_term_in_months, from_month, to_month, step, schedule)
+
+    monthly_payment_rounded = round(monthly_payment(amount, annual_interest_rate, loan_term_in_months), 2)
+    return [
+        {
+            "month": month,
+            "monthly_payment": monthly_payment_rounded,
+            "remaining_balance": balance
         }
+        for month, balance in zip(range(from_month, to_month + 1, step), np.round(balances, 2).tolist())
+    ]
 
-@app.patch("/v1/users/{user_id}/loans/{loan_id}/share/{shared_with_user_id}")
-def share_loan(user_id: int, loan_id: int, shared_with_user_id: int):
-    with SessionLocal() as db:
-        loan = None
-        try:
-            # Fetch loan from DB
-            loan = db.query(Loans).filter(Loans.id == loan_id).first()
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}"
-            )
+def to_cents(values) -> np.ndarray:
+    # Same rounding as the JSON rows, expressed as exact integer cents
+    return np.rint(np.round(values, 2) * 100).astype("<i8")
 
-        # Validate loan exists
-        if not loan:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Loan with id {loan_id} not found"
-            )
+def packed_schedule_response(media_type: str, amount: float, annual_interest_rate: float, loan_term_in_months: int, from_month: int = 1, to_month: Optional[int] = None, step: int = 1, schedule: Optional[Schedule] = None) -> Response:
+    """
+    Columnar schedule: the monthly payment is sent once and balances as a
+    packed little-endian int64 array of cents. Month i of the array is
+    from_month + i * step.
 
-        # Validate user permission
-        if not (user_id == loan.owner_id or user_id in loan.shared_with):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You do not have permission to share this loan"
-            )
+    application/msgpack: a map of from_month, step, count, monthly_payment_cents
+        and remaining_balance_cents (the packed array as bytes).
+    application/octet-stream: a PACKED_SCHEDULE_HEADER struct followed by the packed array.
+    """
+    balances = to_cents(schedule_balances(amount, annual_interest_rate, loan_term_in_months, from_month, to_month, step, schedule))
+    payment_cents = int(to_cents(monthly_payment(amount, annual_interest_rate, loan_term_in_months)))
 
-        # Validate target user
-        if shared_with_user_id in loan.shared_with or shared_with_user_id == loan.owner_id:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="User is already shared or is the loan owner"
-            )
-            
-        # query and make sure user exists
-        shared_with_user = None
-        try:
-            # Fetch user from DB
-            shared_with_user = db.query(Users).filter(Users.id == shared_with_user_id).first()
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}"
-            )
+    if media_type == OCTET_STREAM_MEDIA_TYPE:
+        header = PACKED_SCHEDULE_HEADER.pack(from_month, step, len(balances), payment_cents)
+        return Response(header + balances.tobytes(), media_type=OCTET_STREAM_MEDIA_TYPE)
 
-        if not shared_with_user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"User with id {shared_with_user_id} not found"
+    if msgpack is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail="MessagePack responses require the msgpack package"
+        )
+    content = msgpack.packb({
+        "from_month": from_month,
+        "step": step,
+        "count": len(balances),
+        "monthly_payment_cents": payment_cents,
+        "remaining_balance_cents": balances.tobytes(),
+    })
+    return Response(content, media_type=MSGPACK_MEDIA_TYPE)
+
+def exact_mode_error(request: Request, stream: bool, exact: bool, rounding: str) -> Optional[str]:
+    if not exact:
+        return None
+    if stream or packed_media_type(request) or NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return "Exact mode is only available as a plain JSON response"
+    return rounding_error(rounding)
+
+def packed_media_type(request: Request) -> Optional[str]:
+    accept = request.headers.get("accept", "")
+    for media_type in (MSGPACK_MEDIA_TYPE, "application/x-msgpack", OCTET_STREAM_MEDIA_TYPE):
+        if media_type in accept:
+            return OCTET_STREAM_MEDIA_TYPE if media_type == OCTET_STREAM_MEDIA_TYPE else MSGPACK_MEDIA_TYPE
+    return None
+
+def rounding_error(rounding: str) -> Optional[str]:
+    if rounding not in ROUNDING_POLICIES:
+        return f"Rounding must be one of {', '.join(ROUNDING_POLICIES)}"
+    return None
+
+def cents_to_dollars(cents: np.ndarray) -> list:
+    # cents / 100 is the float closest to the 2 decimal value, so JSON shows exactly that value
+    return (cents / 100).tolist()
+
+def exact_schedule_response(amount: float, annual_interest_rate: float, loan_term_in_months: int, from_month: int = 1, to_month: Optional[int] = None, step: int = 1, rounding: str = "half_up") -> FastJSONResponse:
+    """
+    Schedule tracked in integer cents (see amortization/cents.py). Each row
+    also has the principal and interest parts of its payment, which sum to
+    the loan amount and total interest exactly over the whole schedule.
+    """
+    if to_month is None:
+        to_month = loan_term_in_months
+    with compute_timer():
+        schedule = cents_schedule_caches[rounding].get(amount, annual_interest_rate, loan_term_in_months)
+
+    months = slice(from_month - 1, to_month, step)
+    return FastJSONResponse({
+        "schedule": [
+            {
+                "month": month,
+                "monthly_payment": payment,
+                "remaining_balance": balance,
+                "principal": principal,
+                "interest": interest
+            }
+            for month, payment, balance, principal, interest in zip(
+                range(from_month, to_month + 1, step),
+                cents_to_dollars(schedule.payments[months]),
+                cents_to_dollars(schedule.balances[months]),
+                cents_to_dollars(schedule.principal[months]),
+                cents_to_dollars(schedule.interest[months]),
             )
+        ]
+    }, use_orjson=orjson_safe(amount, schedule.monthly_payment / 100))
 
-        # Update shared_with
-        loan.shared_with.append(shared_with_user_id)
+def exact_summary_response(loan_id: int, amount: float, annual_interest_rate: float, loan_term_in_months: int, month: int, rounding: str = "half_up") -> dict:
+    with compute_timer():
+        schedule = cents_schedule_caches[rounding].get(amount, annual_interest_rate, loan_term_in_months)
 
-        try:
-            db.add(loan)
-            db.commit()
-            db.refresh(loan)
-        except Exception as e:
-            db.rollback()
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}"
+    return {
+        "loan_id": loan_id,
+        "month": month,
+        "principal_balance": int(schedule.balances[month - 1]) / 100,
+        "aggregate_principal_paid": int(schedule.cumulative_principal[month - 1]) / 100,
+        "aggregate_interest_paid": int(schedule.cumulative_interest[month - 1]) / 100,
+    }
+
+def scenario_months_error(loan_term_in_months: int, scenarios: List[Scenario]) -> Optional[str]:
+    for index, scenario in enumerate(scenarios):
+        months = [lump_sum.month for lump_sum in scenario.lump_sums] + [change.month for change in scenario.rate_changes]
+        if any(not 1 <= month <= loan_term_in_months for month in months):
+            return f"Scenario {index}: Month must be between 1 and {loan_term_in_months}"
+    return None
+
+def scenario_response(loan_id: int, amount: float, annual_interest_rate: float, loan_term_in_months: int, batch: ScenarioBatchRequest) -> FastJSONResponse:
+    """
+    Evaluates every scenario plus the unchanged loan (the baseline, row 0) in
+    one vectorized pass; see amortization/scenarios.py for the rules.
+    """
+    with compute_timer():
+        annual_rates, extra_principal = scenario_arrays(annual_interest_rate, loan_term_in_months, [(0, (), ())] + [
+            (
+                scenario.extra_monthly_principal,
+                [(lump_sum.month, lump_sum.amount) for lump_sum in scenario.lump_sums],
+                [(change.month, change.annual_interest_rate) for change in scenario.rate_changes],
             )
+            for scenario in batch.scenarios
+        ])
+        results = evaluate_scenarios(amount, loan_term_in_months, annual_rates, extra_principal, batch.include_schedules)
 
-        return {
-            "loan_id": loan.id,
-            "shared_with": {
-                "user_ids": loan.shared_with
-            }
+    payoff_months = results.payoff_months.tolist()
+    total_interest = np.round(results.total_interest, 2).tolist()
+    total_paid = np.round(results.total_paid, 2).tolist()
+    interest_saved = np.round(results.total_interest[0] - results.total_interest, 2).tolist()
+
+    scenarios = []
+    for index, scenario in enumerate(batch.scenarios, start=1):
+        result = {
+            "name": scenario.name,
+            "payoff_month": payoff_months[index],
+            "total_interest": total_interest[index],
+            "total_paid": total_paid[index],
+            "months_saved": payoff_months[0] - payoff_months[index],
+            "interest_saved": interest_saved[index],
         }
+        if batch.include_schedules:
+            months = slice(0, payoff_months[index] or loan_term_in_months)
+            result["schedule"] = [
+                {
+                    "month": month,
+                    "payment": payment,
+                    "principal": principal,
+                    "interest": interest,
+                    "remaining_balance": balance
+                }
+                for month, payment, principal, interest, balance in zip(
+                    range(1, loan_term_in_months + 1),
+                    np.round(results.payments[index, months], 2).tolist(),
+                    np.round(results.principal[index, months], 2).tolist(),
+                    np.round(results.interest[index, months], 2).tolist(),
+                    np.round(results.balances[index, months], 2).tolist(),
+                )
+            ]
+        scenarios.append(result)
 
-@app.get("/v1/users/{user_id}/loans/{loan_id}/schedule")
-def get_loan_schedule(user_id: int, loan_id: int):
-    with SessionLocal() as db:
-        # Fetch loan from DB
-        loan = None
-        try:
-            loan = db.query(Loans).filter(Loans.id == loan_id).first()
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}"
-            )
+    return FastJSONResponse({
+        "loan_id": loan_id,
+        "baseline": {"payoff_month": payoff_months[0], "total_interest": total_interest[0], "total_paid": total_paid[0]},
+        "scenarios": scenarios,
+    }, use_orjson=orjson_safe(float(results.total_paid.max())))
 
-        if not loan:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Loan with id {loan_id} not found"
-            )
+def schedule_response(amount: float, annual_interest_rate: float, loan_term_in_months: int, from_month: int = 1, to_month: Optional[int] = None, step: int = 1, schedule: Optional[Schedule] = None) -> FastJSONResponse:
+    return FastJSONResponse({
+        "schedule": schedule_rows(amount, annual_interest_rate, loan_term_in_months, from_month, to_month, step, schedule)
+    }, use_orjson=orjson_safe(amount, monthly_payment(amount, annual_interest_rate, loan_term_in_months)))
 
-        # Authorization check
-        if user_id != loan.owner_id and user_id not in loan.shared_with:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Loan is not shared with user"
-            )
+def summary_response(loan_id: int, amount: float, annual_interest_rate: float, loan_term_in_months: int, month: int, schedule: Optional[Schedule] = None) -> dict:
+    # Served from the checkpoint index when enabled, else a materialized, cached or shared schedule when one exists, else the closed form
+    with compute_timer():
+        summary = None
+        if summary_checkpoints:
+            # Bit-identical to the original per-month loop, resumed from the nearest checkpoint
+            summary = summary_checkpoints.month_summary(amount, annual_interest_rate, loan_term_in_months, month)
+        else:
+            if schedule is None:
+                schedule = schedule_cache.peek(amount, annual_interest_rate, loan_term_in_months)
+            if schedule is not None:
+                summary = (float(schedule.balances[month - 1]), float(schedule.cumulative_principal[month - 1]), float(schedule.cumulative_interest[month - 1]))
+            elif shared_schedule_store:
+                summary = shared_schedule_store.month(amount, annual_interest_rate, loan_term_in_months, month)
 
-        # Loan details
-        principal = loan.amount
-        annual_interest_rate = loan.annual_interest_rate
-        months = loan.loan_term_in_months
-        monthly_rate = annual_interest_rate / 12.0
+        if summary is None:
+            summary = month_summary(amount, annual_interest_rate, loan_term_in_months, month)
+        principal_balance, total_principal_paid, total_interest_paid = summary
 
-        if monthly_rate > 0:
-            monthly_payment = (
-                principal * monthly_rate / (1 - math.pow(1 + monthly_rate, -months))
-            )
+    return {
+        "loan_id": loan_id,
+        "month": month,
+        "principal_balance": round(principal_balance, 2),
+        "aggregate_principal_paid": round(total_principal_paid, 2),
+        "aggregate_interest_paid": round(total_interest_paid, 2),
+    }
+
+def iter_schedule_rows(amount: float, annual_interest_rate: float, loan_term_in_months: int, from_month: int = 1, to_month: Optional[int] = None, step: int = 1):
+    """
+    Yields schedule rows a chunk of months at a time, so memory stays constant
+    regardless of the loan term. Uses a cached schedule if one is already warm,
+    and computes one up front for terms that need the loop rather than rerun
+    the loop from month 1 for every chunk.
+    """
+    if to_month is None:
+        to_month = loan_term_in_months
+    schedule = schedule_cache.peek(amount, annual_interest_rate, loan_term_in_months)
+    if schedule is None and not closed_form_is_exact(amount, annual_interest_rate, loan_term_in_months):
+        schedule = compute_schedule(amount, annual_interest_rate, loan_term_in_months)
+    chunk_months = STREAM_CHUNK_MONTHS * step
+
+    for first_month in range(from_month, to_month + 1, chunk_months):
+        last_month = min(first_month + chunk_months - 1, to_month)
+        yield from schedule_rows(amount, annual_interest_rate, loan_term_in_months, first_month, last_month, step, schedule)
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + "\n"
+
+def stream_json_array(rows):
+    yield '{"schedule": ['
+    separator = ""
+    for row in rows:
+        yield separator + json.dumps(row)
+        separator = ", "
+    yield "]}"
+
+"""
+ENDPOINTS
+"""
+@app.post("/v1/users", status_code=status.HTTP_201_CREATED, response_model=UserCreated)
+def create_user(user: UserCreate, db: Session = Depends(get_db)):
+    try:
+        user_id = db.scalar(queries.insert_user(user.email_address))
+        db.commit()
+        return {"user_id": user_id}
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Email already exists"
+        )
+
+@app.post("/v1/users:batch", status_code=status.HTTP_201_CREATED, response_model=UserBatchCreated)
+def create_users_batch(batch: UserBatchCreate, db: Session = Depends(get_db)):
+    emails = [user.email_address for user in batch.users]
+
+    existing = set()
+    try:
+        if emails:
+            existing = set(db.scalars(select(Users.email).where(Users.email.in_(set(emails)))))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    # Validate every item up front, including duplicates within the batch
+    results = []
+    rows = []
+    for email in emails:
+        if email in existing:
+            results.append({"error": "Email already exists"})
         else:
-            monthly_payment = principal / months
+            existing.add(email)
+            results.append(None)
+            rows.append({"email": email})
 
-        balance = principal
-        schedule = []
+    # Insert all new users in one executemany within a single transaction
+    user_ids = []
+    try:
+        if rows:
+            user_ids = db.scalars(
+                insert(Users).returning(Users.id, sort_by_parameter_order=True),
+                rows
+            ).all()
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Email already exists"
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
 
-        for month in range(1, months + 1):
-            interest = balance * monthly_rate
-            principal_payment = monthly_payment - interest
-            balance -= principal_payment
-            balance = max(balance, 0)
+    new_ids = iter(user_ids)
+    return {
+        "users": [result if result is not None else {"user_id": next(new_ids)} for result in results]
+    }
 
-            schedule.append({
-                "month": month,
-                "monthly_payment": round(monthly_payment, 2),
-                "remaining_balance": round(balance, 2)
-            })
+@app.post("/v1/users/{user_id}/loans", status_code=status.HTTP_201_CREATED, response_model=LoanCreated)
+def create_loan(user_id: int, loan: LoanCreate, db: Session = Depends(get_db)):
+    # Validate loan parameters first
+    if not valid_loan_parameters(loan):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid loan parameters"
+        )
+
+    # Create loan, checking the user exists in the same statement
+    loan_id = None
+    try:
+        loan_id = commit_write(db, lambda session: session.scalar(queries.insert_loan_for_existing_user(
+            user_id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months
+        )))
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    if loan_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found"
+        )
+
+    cache_created_loans([(loan_id, user_id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months)])
+    enqueue_materialization([(loan_id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months)])
+
+    return {
+        "loan_id": loan_id,
+        "owner_id": user_id,
+        "amount": loan.amount,
+        "annual_interest_rate": loan.annual_interest_rate,
+        "loan_term_in_months": loan.loan_term_in_months
+    }
+
+@app.post("/v1/users/{user_id}/loans:batch", status_code=status.HTTP_201_CREATED, response_model=LoanBatchCreated)
+def create_loans_batch(user_id: int, batch: LoanBatchCreate, db: Session = Depends(get_db)):
+    user = None
+    try:
+        # Check if user exists
+        user = db.get(Users, user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found"
+        )
+
+    # Validate every item up front
+    rows = [
+        {
+            "owner_id": user_id,
+            "amount": loan.amount,
+            "annual_interest_rate": loan.annual_interest_rate,
+            "loan_term_in_months": loan.loan_term_in_months
+        }
+        for loan in batch.loans if valid_loan_parameters(loan)
+    ]
 
+    # Insert all valid loans in one executemany within a single transaction
+    loan_ids = []
+    try:
+        if rows:
+            loan_ids = db.scalars(
+                insert(Loans).returning(Loans.id, sort_by_parameter_order=True),
+                rows
+            ).all()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    new_ids = iter(loan_ids)
+    results = []
+    for loan in batch.loans:
+        if not valid_loan_parameters(loan):
+            results.append({"error": "Invalid loan parameters"})
+            continue
+        results.append({
+            "loan_id": next(new_ids),
+            "owner_id": user_id,
+            "amount": loan.amount,
+            "annual_interest_rate": loan.annual_interest_rate,
+            "loan_term_in_months": loan.loan_term_in_months
+        })
+
+    created = [result for result in results if "loan_id" in result]
+    cache_created_loans([
+        (result["loan_id"], user_id, result["amount"], result["annual_interest_rate"], result["loan_term_in_months"])
+        for result in created
+    ])
+    enqueue_materialization([
+        (result["loan_id"], result["amount"], result["annual_interest_rate"], result["loan_term_in_months"])
+        for result in created
+    ])
+
+    return {"loans": results}
+
+@app.get("/v1/users/{user_id}/loans", response_model=LoanPage, response_model_exclude_unset=True)
+def get_loans(user_id: int, limit: int = 10, offset: int = 0, cursor: Optional[str] = None, db: Session = Depends(get_db)):
+    # Cursor mode (pass an empty cursor for the first page) seeks on the
+    # (owner_id, id) index instead of scanning and discarding skipped rows
+    if cursor is not None:
+        after_id = decode_cursor(cursor) if cursor else 0
+        query = queries.owned_loan_ids_page(user_id, limit + 1, after_id=after_id)
+    else:
+        query = queries.owned_loan_ids_page(user_id, limit, offset=offset)
+
+    # Fetch loans and check the user exists in one round-trip
+    loan_ids = None
+    try:
+        loan_ids = queries.page_loan_ids(db.execute(query).all())
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    if loan_ids is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found"
+        )
+
+    if cursor is not None:
+        page = loan_ids[:limit]
         return {
-            "schedule": schedule
+            "loans": [{"loan_id": loan_id} for loan_id in page],
+            "next_cursor": encode_cursor(page[-1]) if len(loan_ids) > limit and page else None,
         }
 
-@app.get("/v1/users/{user_id}/loans/{loan_id}/schedule/{month}")
-def get_loan_summary(user_id: int, loan_id: int, month: int):
-    with SessionLocal() as db:
-        # Fetch loan from DB
-        loan = None
-        try:
-            loan = db.query(Loans).filter(Loans.id == loan_id).first()
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Database error: {e}"
-            )
-        
-        if not loan:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Loan with id {loan_id} not found"
-            )
+    loans_list = [{"loan_id": loan_id} for loan_id in loan_ids]
 
-        # Authorization check
-        if user_id != loan.owner_id and user_id not in loan.shared_with:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Loan is not shared with user"
-            )
+    return {
+        "loans": loans_list, 
+        "offset": offset + len(loans_list),
+    }
 
-        # Validate month
-        if month < 1 or month > loan.loan_term_in_months:
-            raise HTTPException(
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-                detail=f"Month must be between 1 and {loan.loan_term_in_months}"
-            )
+@app.patch("/v1/users/{user_id}/loans/{loan_id}/share/{shared_with_user_id}", response_model=LoanShared)
+def share_loan(user_id: int, loan_id: int, shared_with_user_id: int, db: Session = Depends(get_db)):
+    # Fetch the loan, its current shares and whether the target user exists together
+    rows = []
+    try:
+        rows = db.execute(queries.loan_shares_with_target(loan_id, shared_with_user_id)).all()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
 
-        # Loan Calculations
-        principal = loan.amount
-        annual_interest_rate = loan.annual_interest_rate
-        months = loan.loan_term_in_months
-        monthly_rate = annual_interest_rate / 12.0
+    # Validate loan exists
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Loan with id {loan_id} not found"
+        )
 
-        if monthly_rate > 0:
-            monthly_payment = principal * monthly_rate / (1 - math.pow(1 + monthly_rate, -months))
-        else:
-            monthly_payment = principal / months
+    owner_id = rows[0].owner_id
+    shared_with = [row.user_id for row in rows if row.user_id is not None]
 
-        principal_balance = principal
-        total_interest_paid = 0
-        total_principal_paid = 0
+    # Validate user permission
+    if not (user_id == owner_id or user_id in shared_with):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to share this loan"
+        )
 
-        for m in range(1, month + 1):
-            interest = principal_balance * monthly_rate
-            principal_payment = monthly_payment - interest
-            principal_balance -= principal_payment
-            principal_balance = max(principal_balance, 0)
+    # Validate target user
+    if shared_with_user_id in shared_with or shared_with_user_id == owner_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is already shared or is the loan owner"
+        )
 
-            total_interest_paid += interest
-            total_principal_paid += principal_payment
+    if not rows[0].target_exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {shared_with_user_id} not found"
+        )
 
-        return {
-            "loan_id": loan.id,
-            "month": month,
-            "principal_balance": round(principal_balance, 2),
-            "aggregate_principal_paid": round(total_principal_paid, 2),
-            "aggregate_interest_paid": round(total_interest_paid, 2),
+    # Add the share
+    try:
+        commit_write(db, lambda session: write_share_change(session, queries.insert_loan_share(loan_id, shared_with_user_id), loan_id, shared_with_user_id))
+        loan_cache.invalidate_access(shared_with_user_id, loan_id)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is already shared or is the loan owner"
+        )
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    return {
+        "loan_id": loan_id,
+        "shared_with": {
+            "user_ids": sorted(shared_with + [shared_with_user_id])
+        }
+    }
+
+@app.delete("/v1/users/{user_id}/loans/{loan_id}/share/{shared_with_user_id}", response_model=LoanShared)
+def revoke_loan_share(user_id: int, loan_id: int, shared_with_user_id: int, db: Session = Depends(get_db)):
+    # Fetch the loan and its current shares together
+    rows = []
+    try:
+        rows = db.execute(queries.loan_shares_with_target(loan_id, shared_with_user_id)).all()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    # Validate loan exists
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Loan with id {loan_id} not found"
+        )
+
+    owner_id = rows[0].owner_id
+    shared_with = [row.user_id for row in rows if row.user_id is not None]
+
+    # Validate user permission: the owner can revoke any share, anyone else only their own
+    if not (user_id == owner_id or user_id == shared_with_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to revoke this share"
+        )
+
+    if shared_with_user_id not in shared_with:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Loan is not shared with user {shared_with_user_id}"
+        )
+
+    # Remove the share
+    try:
+        commit_write(db, lambda session: write_share_change(session, queries.delete_loan_share(loan_id, shared_with_user_id), loan_id, shared_with_user_id))
+        loan_cache.invalidate_access(shared_with_user_id, loan_id)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    return {
+        "loan_id": loan_id,
+        "shared_with": {
+            "user_ids": [user for user in shared_with if user != shared_with_user_id]
+        }
+    }
+
+@app.get("/v1/users/{user_id}/shared-loans", response_model=LoanPage, response_model_exclude_unset=True)
+def get_shared_loans(user_id: int, limit: int = 10, offset: int = 0, db: Session = Depends(get_db)):
+    # Fetch loans shared with the user through the (user_id, loan_id) index
+    loan_ids = None
+    try:
+        loan_ids = queries.page_loan_ids(db.execute(queries.shared_loan_ids_page(user_id, limit, offset)).all())
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    if loan_ids is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found"
+        )
+
+    loans_list = [{"loan_id": loan_id} for loan_id in loan_ids]
+
+    return {
+        "loans": loans_list,
+        "offset": offset + len(loans_list),
+    }
+
+@app.get("/v1/users/{user_id}/portfolio", response_model=Portfolio)
+def get_portfolio(user_id: int, month: int, db: Session = Depends(get_db)):
+    if month < 1:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Month must be at least 1"
+        )
+
+    # Fetch every owned and shared loan in one query
+    rows = []
+    try:
+        rows = db.execute(queries.portfolio_loans(user_id)).all()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found"
+        )
+
+    rows = [row for row in rows if row.id is not None]
+    loan_ids = [row.id for row in rows]
+
+    # Compute every loan's summary in one vectorized batch
+    with compute_timer():
+        summaries = portfolio_month_summaries(
+            np.array([row.amount for row in rows], dtype=np.float64),
+            np.array([row.annual_interest_rate for row in rows], dtype=np.float64),
+            np.array([row.loan_term_in_months for row in rows], dtype=np.float64),
+            month
+        )
+
+    loans = [
+        {
+            "loan_id": loan_id,
+            "month": loan_month,
+            "principal_balance": balance,
+            "aggregate_principal_paid": principal_paid,
+            "aggregate_interest_paid": interest_paid,
+            "total_interest": total_interest,
         }
+        for loan_id, loan_month, balance, principal_paid, interest_paid, total_interest in zip(
+            loan_ids,
+            summaries["months"].tolist(),
+            np.round(summaries["balances"], 2).tolist(),
+            np.round(summaries["principal_paid"], 2).tolist(),
+            np.round(summaries["interest_paid"], 2).tolist(),
+            np.round(summaries["total_interest"], 2).tolist(),
+        )
+    ]
+
+    totals = {
+        "loan_count": len(loans),
+        "principal_balance": round(float(summaries["balances"].sum()), 2),
+        "aggregate_principal_paid": round(float(summaries["principal_paid"].sum()), 2),
+        "aggregate_interest_paid": round(float(summaries["interest_paid"].sum()), 2),
+        "total_interest": round(float(summaries["total_interest"].sum()), 2),
+    }
+
+    # Everything is already plain floats and ints, so skip validation and the jsonable_encoder walk
+    return FastJSONResponse({
+        "user_id": user_id,
+        "month": month,
+        "loans": loans,
+        "totals": totals,
+    }, use_orjson=orjson_safe(totals["aggregate_principal_paid"] + totals["principal_balance"], totals["total_interest"]))
+
+@app.get("/v1/users/{user_id}/loans/{loan_id}/schedule", response_model=LoanSchedule)
+def get_loan_schedule(request: Request, user_id: int, loan_id: int, stream: bool = False, from_month: int = 1, to_month: Optional[int] = None, step: int = 1, exact: bool = False, rounding: str = "half_up", db: Session = Depends(get_db)):
+    loan, schedule = fetch_authorized_loan(db, user_id, loan_id)
+    terms = (loan.amount, loan.annual_interest_rate, loan.loan_term_in_months)
+
+    # Validate month range
+    if to_month is None:
+        to_month = loan.loan_term_in_months
+    error = month_range_error(loan.loan_term_in_months, from_month, to_month, step) or exact_mode_error(request, stream, exact, rounding)
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=error
+        )
+
+    # Exact-money mode, in integer cents
+    if exact:
+        return exact_schedule_response(*terms, from_month, to_month, step, rounding)
+
+    # Columnar MessagePack / binary formats, opted into via the Accept header
+    media_type = packed_media_type(request)
+    if media_type:
+        return packed_schedule_response(media_type, *terms, from_month, to_month, step, schedule)
+
+    # Streaming mode, opted into via the Accept header or ?stream=1
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        rows = iter_schedule_rows(*terms, from_month, to_month, step)
+        return StreamingResponse(stream_ndjson(rows), media_type=NDJSON_MEDIA_TYPE)
+    if stream:
+        rows = iter_schedule_rows(*terms, from_month, to_month, step)
+        return StreamingResponse(stream_json_array(rows), media_type="application/json")
+
+    # Loan details
+    return schedule_response(*terms, from_month, to_month, step, schedule)
 
+@app.post("/v1/users/{user_id}/schedules:batch", response_model=LoanScheduleBatch)
+def get_loan_schedules_batch(user_id: int, batch: ScheduleBatchRequest, db: Session = Depends(get_db)):
+    # Fetch and authorize every requested loan with a single IN query
+    loans = {}
+    try:
+        loan_ids = {item.loan_id for item in batch.loans}
+        if loan_ids:
+            loans = {loan.id: (loan, allowed, arrays) for loan, allowed, arrays in db.execute(queries.loans_with_access(loan_ids, user_id))}
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    # Loans with identical terms share one unpacked materialized schedule; without
+    # one, schedule_rows looks in the schedule cache and shared store before computing
+    schedules = {}
+    results = []
+    for item in batch.loans:
+        if item.loan_id not in loans:
+            results.append({"loan_id": item.loan_id, "error": f"Loan with id {item.loan_id} not found"})
+            continue
+
+        loan, allowed, arrays = loans[item.loan_id]
+        if not allowed:
+            results.append({"loan_id": item.loan_id, "error": "Loan is not shared with user"})
+            continue
+
+        from_month = 1 if item.from_month is None else item.from_month
+        to_month = loan.loan_term_in_months if item.to_month is None else item.to_month
+        error = month_range_error(loan.loan_term_in_months, from_month, to_month, item.step)
+        if error:
+            results.append({"loan_id": item.loan_id, "error": error})
+            continue
+
+        terms = (loan.amount, loan.annual_interest_rate, loan.loan_term_in_months)
+        if terms not in schedules:
+            with compute_timer():
+                schedules[terms] = unpack_schedule(arrays) if arrays else None
+
+        results.append({"loan_id": item.loan_id, "schedule": schedule_rows(*terms, from_month, to_month, item.step, schedules[terms])})
+
+    # Schedules are plain rows already, so skip validation and the jsonable_encoder walk
+    return FastJSONResponse({"schedules": results}, use_orjson=orjson_safe(*(
+        max(loan.amount, monthly_payment(loan.amount, loan.annual_interest_rate, loan.loan_term_in_months))
+        for loan, _, _ in loans.values()
+    )))
 
+@app.get("/v1/users/{user_id}/loans/{loan_id}/schedule/{month}", response_model=MonthSummary)
+def get_loan_summary(user_id: int, loan_id: int, month: int, exact: bool = False, rounding: str = "half_up", db: Session = Depends(get_db)):
+    loan, schedule = fetch_authorized_loan(db, user_id, loan_id)
 
+    # Validate month
+    if month < 1 or month > loan.loan_term_in_months:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Month must be between 1 and {loan.loan_term_in_months}"
+        )
 
+    # Exact-money mode, in integer cents
+    if exact:
+        error = rounding_error(rounding)
+        if error:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error
+            )
+        return exact_summary_response(loan.id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months, month, rounding)
 
+    # Loan Calculations
+    return summary_response(loan.id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months, month, schedule)
+
+@app.post("/v1/users/{user_id}/loans/{loan_id}/scenarios", response_model=ScenarioBatch, response_model_exclude_unset=True)
+def evaluate_loan_scenarios(user_id: int, loan_id: int, batch: ScenarioBatchRequest, db: Session = Depends(get_db)):
+    loan, _ = fetch_authorized_loan(db, user_id, loan_id)
+
+    # Validate lump sum and rate change months
+    error = scenario_months_error(loan.loan_term_in_months, batch.scenarios)
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=error
+        )
 
+    return scenario_response(loan.id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months, batch)
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    return Response(registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
@@ -0,0 +1,402 @@
+"""
+Async variant of the API in main.py. Every endpoint is `async def` and talks
+to the database through an AsyncEngine, so requests don't hold a threadpool
+worker while waiting on the database. The routes it has respond as in main.py,
+but it covers only part of the API:
+
+    - no /v1/users:batch, /v1/users/{user_id}/loans:batch,
+      /v1/users/{user_id}/shared-loans, /v1/users/{user_id}/portfolio or
+      /v1/users/{user_id}/schedules:batch (404 here)
+    - writes commit on their own session; GROUP_COMMIT is ignored
+
+Select it by serving this module instead of main.py:
+
+    fastapi dev main_async.py
+"""
+from typing import Optional, Tuple
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi import status
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.database import create_tables, get_async_db
+from database.cache import LoanRow, loan_cache
+from database.invalidation import invalidation_channel
+from database import queries
+from database.materialization import schedule_materializer
+from amortization.calculations import Schedule
+from metrics import PROMETHEUS_MEDIA_TYPE, instrument, registry
+from main import (
+    NDJSON_MEDIA_TYPE,
+    LoanCreate,
+    LoanCreated,
+    LoanPage,
+    LoanSchedule,
+    LoanShared,
+    MonthSummary,
+    ScenarioBatch,
+    ScenarioBatchRequest,
+    UserCreate,
+    UserCreated,
+    authorize_loan_row,
+    cache_created_loans,
+    cached_authorized_loan,
+    decode_cursor,
+    encode_cursor,
+    enqueue_materialization,
+    exact_mode_error,
+    exact_schedule_response,
+    exact_summary_response,
+    iter_schedule_rows,
+    month_range_error,
+    packed_media_type,
+    packed_schedule_response,
+    rounding_error,
+    scenario_months_error,
+    scenario_response,
+    schedule_response,
+    stream_json_array,
+    stream_ndjson,
+    summary_response,
+    valid_loan_parameters,
+)
+
+app = FastAPI()
+instrument(app)
+
+# Initialize database tables on startup
+@app.on_event("startup")
+def startup_event():
+    create_tables()
+    invalidation_channel.start()
+    if schedule_materializer:
+        schedule_materializer.start_backfill()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    invalidation_channel.stop()
+
+"""
+HELPERS
+"""
+async def fetch_authorized_loan(db: AsyncSession, user_id: int, loan_id: int) -> Tuple[LoanRow, Optional[Schedule]]:
+    loan = cached_authorized_loan(user_id, loan_id)
+    if loan is not None:
+        # Any schedule is picked up from the schedule cache
+        return loan, None
+
+    # Loan row, access check and materialized schedule in a single statement
+    invalidations = loan_cache.invalidations
+    row = None
+    try:
+        row = (await db.execute(queries.loan_with_access(loan_id, user_id))).first()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    return authorize_loan_row(user_id, loan_id, row, invalidations)
+
+"""
+ENDPOINTS
+"""
+@app.post("/v1/users", status_code=status.HTTP_201_CREATED, response_model=UserCreated)
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    try:
+        user_id = await db.scalar(queries.insert_user(user.email_address))
+        await db.commit()
+        return {"user_id": user_id}
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Email already exists"
+        )
+
+@app.post("/v1/users/{user_id}/loans", status_code=status.HTTP_201_CREATED, response_model=LoanCreated)
+async def create_loan(user_id: int, loan: LoanCreate, db: AsyncSession = Depends(get_async_db)):
+    # Validate loan parameters first
+    if not valid_loan_parameters(loan):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Invalid loan parameters"
+        )
+
+    # Create loan, checking the user exists in the same statement
+    loan_id = None
+    try:
+        loan_id = await db.scalar(queries.insert_loan_for_existing_user(
+            user_id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months
+        ))
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    if loan_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found"
+        )
+
+    cache_created_loans([(loan_id, user_id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months)])
+    enqueue_materialization([(loan_id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months)])
+
+    return {
+        "loan_id": loan_id,
+        "owner_id": user_id,
+        "amount": loan.amount,
+        "annual_interest_rate": loan.annual_interest_rate,
+        "loan_term_in_months": loan.loan_term_in_months
+    }
+
+@app.get("/v1/users/{user_id}/loans", response_model=LoanPage, response_model_exclude_unset=True)
+async def get_loans(user_id: int, limit: int = 10, offset: int = 0, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    if cursor is not None:
+        after_id = decode_cursor(cursor) if cursor else 0
+        query = queries.owned_loan_ids_page(user_id, limit + 1, after_id=after_id)
+    else:
+        query = queries.owned_loan_ids_page(user_id, limit, offset=offset)
+
+    # Fetch loans and check the user exists in one round-trip
+    loan_ids = None
+    try:
+        loan_ids = queries.page_loan_ids((await db.execute(query)).all())
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    if loan_ids is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {user_id} not found"
+        )
+
+    if cursor is not None:
+        page = loan_ids[:limit]
+        return {
+            "loans": [{"loan_id": loan_id} for loan_id in page],
+            "next_cursor": encode_cursor(page[-1]) if len(loan_ids) > limit and page else None,
+        }
+
+    return {
+        "loans": [{"loan_id": loan_id} for loan_id in loan_ids],
+        "offset": offset + len(loan_ids),
+    }
+
+@app.patch("/v1/users/{user_id}/loans/{loan_id}/share/{shared_with_user_id}", response_model=LoanShared)
+async def share_loan(user_id: int, loan_id: int, shared_with_user_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Fetch the loan, its current shares and whether the target user exists together
+    rows = []
+    try:
+        rows = (await db.execute(queries.loan_shares_with_target(loan_id, shared_with_user_id))).all()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    # Validate loan exists
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Loan with id {loan_id} not found"
+        )
+
+    owner_id = rows[0].owner_id
+    shared_with = [row.user_id for row in rows if row.user_id is not None]
+
+    # Validate user permission
+    if not (user_id == owner_id or user_id in shared_with):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to share this loan"
+        )
+
+    # Validate target user
+    if shared_with_user_id in shared_with or shared_with_user_id == owner_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is already shared or is the loan owner"
+        )
+
+    if not rows[0].target_exists:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User with id {shared_with_user_id} not found"
+        )
+
+    # Add the share
+    try:
+        await db.execute(queries.insert_loan_share(loan_id, shared_with_user_id))
+        # Other worker processes drop their cached decision once this commits
+        invalidation = invalidation_channel.statement(loan_id, shared_with_user_id)
+        if invalidation is not None:
+            await db.execute(invalidation)
+        await db.commit()
+        loan_cache.invalidate_access(shared_with_user_id, loan_id)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="User is already shared or is the loan owner"
+        )
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    return {
+        "loan_id": loan_id,
+        "shared_with": {
+            "user_ids": sorted(shared_with + [shared_with_user_id])
+        }
+    }
+
+@app.delete("/v1/users/{user_id}/loans/{loan_id}/share/{shared_with_user_id}", response_model=LoanShared)
+async def revoke_loan_share(user_id: int, loan_id: int, shared_with_user_id: int, db: AsyncSession = Depends(get_async_db)):
+    # Fetch the loan and its current shares together
+    rows = []
+    try:
+        rows = (await db.execute(queries.loan_shares_with_target(loan_id, shared_with_user_id))).all()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    # Validate loan exists
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Loan with id {loan_id} not found"
+        )
+
+    owner_id = rows[0].owner_id
+    shared_with = [row.user_id for row in rows if row.user_id is not None]
+
+    # Validate user permission: the owner can revoke any share, anyone else only their own
+    if not (user_id == owner_id or user_id == shared_with_user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You do not have permission to revoke this share"
+        )
+
+    if shared_with_user_id not in shared_with:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Loan is not shared with user {shared_with_user_id}"
+        )
+
+    # Remove the share
+    try:
+        await db.execute(queries.delete_loan_share(loan_id, shared_with_user_id))
+        # Other worker processes drop their cached decision once this commits
+        invalidation = invalidation_channel.statement(loan_id, shared_with_user_id)
+        if invalidation is not None:
+            await db.execute(invalidation)
+        await db.commit()
+        loan_cache.invalidate_access(shared_with_user_id, loan_id)
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Database error: {e}"
+        )
+
+    return {
+        "loan_id": loan_id,
+        "shared_with": {
+            "user_ids": [user for user in shared_with if user != shared_with_user_id]
+        }
+    }
+
+@app.get("/v1/users/{user_id}/loans/{loan_id}/schedule", response_model=LoanSchedule)
+async def get_loan_schedule(request: Request, user_id: int, loan_id: int, stream: bool = False, from_month: int = 1, to_month: Optional[int] = None, step: int = 1, exact: bool = False, rounding: str = "half_up", db: AsyncSession = Depends(get_async_db)):
+    loan, schedule = await fetch_authorized_loan(db, user_id, loan_id)
+    terms = (loan.amount, loan.annual_interest_rate, loan.loan_term_in_months)
+
+    # Validate month range
+    if to_month is None:
+        to_month = loan.loan_term_in_months
+    error = month_range_error(loan.loan_term_in_months, from_month, to_month, step) or exact_mode_error(request, stream, exact, rounding)
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=error
+        )
+
+    # The schedule math is CPU-bound, so it runs in the threadpool rather than on the event loop
+    # Exact-money mode, in integer cents
+    if exact:
+        return await run_in_threadpool(exact_schedule_response, *terms, from_month, to_month, step, rounding)
+
+    # Columnar MessagePack / binary formats, opted into via the Accept header
+    media_type = packed_media_type(request)
+    if media_type:
+        return await run_in_threadpool(packed_schedule_response, media_type, *terms, from_month, to_month, step, schedule)
+
+    # Streaming mode, opted into via the Accept header or ?stream=1. The rows are
+    # sync generators, which StreamingResponse already iterates in the threadpool
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        rows = iter_schedule_rows(*terms, from_month, to_month, step)
+        return StreamingResponse(stream_ndjson(rows), media_type=NDJSON_MEDIA_TYPE)
+    if stream:
+        rows = iter_schedule_rows(*terms, from_month, to_month, step)
+        return StreamingResponse(stream_json_array(rows), media_type="application/json")
+
+    # Loan details
+    return await run_in_threadpool(schedule_response, *terms, from_month, to_month, step, schedule)
+
+@app.get("/v1/users/{user_id}/loans/{loan_id}/schedule/{month}", response_model=MonthSummary)
+async def get_loan_summary(user_id: int, loan_id: int, month: int, exact: bool = False, rounding: str = "half_up", db: AsyncSession = Depends(get_async_db)):
+    loan, schedule = await fetch_authorized_loan(db, user_id, loan_id)
+
+    # Validate month
+    if month < 1 or month > loan.loan_term_in_months:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Month must be between 1 and {loan.loan_term_in_months}"
+        )
+
+    # Exact-money mode, in integer cents
+    if exact:
+        error = rounding_error(rounding)
+        if error:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=error
+            )
+        return await run_in_threadpool(exact_summary_response, loan.id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months, month, rounding)
+
+    # Loan Calculations, in the threadpool like the schedule math
+    return await run_in_threadpool(summary_response, loan.id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months, month, schedule)
+
+@app.post("/v1/users/{user_id}/loans/{loan_id}/scenarios", response_model=ScenarioBatch, response_model_exclude_unset=True)
+async def evaluate_loan_scenarios(user_id: int, loan_id: int, batch: ScenarioBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    loan, _ = await fetch_authorized_loan(db, user_id, loan_id)
+
+    # Validate lump sum and rate change months
+    error = scenario_months_error(loan.loan_term_in_months, batch.scenarios)
+    if error:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=error
+        )
+
+    return await run_in_threadpool(scenario_response, loan.id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months, batch)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(registry.render(), media_type=PROMETHEUS_MEDIA_TYPE)
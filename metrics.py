@@ -0,0 +1,226 @@
+"""
+Low-overhead request instrumentation exposed in the Prometheus text format.
+
+MetricsMiddleware times every request and records its response size. A
+per-request RequestStats object lives in a context variable so the SQLAlchemy
+cursor hooks and compute_timer() can add to it from the endpoint (including
+threadpool workers and the async engine's greenlets) without any locking.
+Everything is aggregated per route template, e.g.
+"GET /v1/users/{user_id}/loans/{loan_id}/schedule", when the request ends.
+
+Set METRICS_ENABLED=0 to turn it off.
+"""
+import bisect
+import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds", "compute_seconds", "response_bytes")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.compute_seconds = 0.0
+        self.response_bytes = 0
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names, values, extra: str = "") -> str:
+    labels = [f'{name}="{escape_label(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, label_names=()):
+        self.name = name
+        self.help = help
+        self.label_names = label_names
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def inc(self, label_values=(), amount: float = 1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            series = sorted(self.series.items())
+        for label_values, value in series:
+            lines.append(f"{self.name}{format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets, label_names=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.label_names = label_names
+        # label values -> [per-bucket counts (last one is +Inf), sum, count]
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label_values, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted((label_values, (list(counts), total, count)) for label_values, (counts, total, count) in self.series.items())
+        for label_values, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                labels = format_labels(self.label_names, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        route = ("route",)
+        self.requests = Counter("http_requests_total", "Requests by route and status code.", ("route", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "Request latency, including streaming the body.", LATENCY_BUCKETS, route)
+        self.response_size = Histogram("http_response_size_bytes", "Serialized response body size.", SIZE_BUCKETS, route)
+        self.statements = Histogram("db_statements_per_request", "Database statements executed per request.", STATEMENT_BUCKETS, route)
+        self.db_time = Histogram("db_duration_seconds", "Time spent executing database statements per request.", LATENCY_BUCKETS, route)
+        self.compute_time = Histogram("amortization_compute_seconds", "Time spent computing amortization schedules per request.", LATENCY_BUCKETS, route)
+        self.collectors = []
+
+    def add_collector(self, collect):
+        """Registers a callable returning extra exposition lines, rendered on every scrape."""
+        self.collectors.append(collect)
+
+    def observe_request(self, route: str, status_code: int, seconds: float, stats: RequestStats):
+        label_values = (route,)
+        self.requests.inc((route, status_code))
+        self.latency.observe(label_values, seconds)
+        self.response_size.observe(label_values, stats.response_bytes)
+        self.statements.observe(label_values, stats.statements)
+        self.db_time.observe(label_values, stats.db_seconds)
+        self.compute_time.observe(label_values, stats.compute_seconds)
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.requests, self.latency, self.response_size, self.statements, self.db_time, self.compute_time):
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+def stats_collector(prefix: str, stats):
+    """Collector exposing every numeric value of a cache's stats() dict as a gauge."""
+    def collect() -> list:
+        lines = []
+        for key, value in stats().items():
+            if isinstance(value, (bool, int, float)):
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {float(value)}")
+        return lines
+    return collect
+
+def route_label(scope) -> str:
+    route = scope.get("route")
+    return f"{scope['method']} {route.path if route is not None else 'unmatched'}"
+
+class MetricsMiddleware:
+    """Pure ASGI middleware, so it adds no extra task or body buffering per request."""
+    def __init__(self, app, registry: Registry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+        start = perf_counter()
+
+        async def send_with_metrics(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                stats.response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            current_request.reset(token)
+            self.registry.observe_request(route_label(scope), status_code, perf_counter() - start, stats)
+
+@contextmanager
+def compute_timer():
+    """Adds the time spent in the block to the current request's amortization compute time."""
+    stats = current_request.get()
+    if stats is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        stats.compute_seconds += perf_counter() - start
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_start", []).append(perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["metrics_start"].pop()
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_seconds += perf_counter() - start
+
+def handle_error(exception_context):
+    # after_cursor_execute doesn't fire for failed statements, so drop their start time
+    starts = exception_context.connection.info.get("metrics_start") if exception_context.connection is not None else None
+    if starts:
+        starts.pop()
+
+_instrumented = False
+
+def instrument(app):
+    """Adds the middleware to app and hooks every Engine (sync and async) once."""
+    global _instrumented
+    if not METRICS_ENABLED:
+        return
+    app.add_middleware(MetricsMiddleware)
+    if not _instrumented:
+        event.listen(Engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(Engine, "handle_error", handle_error)
+        _instrumented = True
@@ -0,0 +1,457 @@
+import math
+import random
+import subprocess
+import sys
+import time
+import uuid
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from amortization.calculations import amortization_schedule, balances_between, month_summary, portfolio_month_summaries
+from amortization.cache import ScheduleCache, schedule_nbytes
+from amortization.checkpoints import CheckpointIndex
+from amortization.cents import cents_schedule
+from amortization.scenarios import evaluate_scenarios, scenario_arrays
+from amortization import shared_store as shared_store_module
+from amortization.shared_store import SharedScheduleStore, fcntl
+
+
+def iterative_month_summary(principal, annual_interest_rate, months, month):
+    # Reference implementation: the original per-month loop from get_loan_summary
+    monthly_rate = annual_interest_rate / 12.0
+
+    if monthly_rate > 0:
+        monthly_payment = principal * monthly_rate / (1 - math.pow(1 + monthly_rate, -months))
+    else:
+        monthly_payment = principal / months
+
+    principal_balance = principal
+    total_interest_paid = 0
+    total_principal_paid = 0
+
+    for m in range(1, month + 1):
+        interest = principal_balance * monthly_rate
+        principal_payment = monthly_payment - interest
+        principal_balance -= principal_payment
+        principal_balance = max(principal_balance, 0)
+
+        total_interest_paid += interest
+        total_principal_paid += principal_payment
+
+    return principal_balance, total_principal_paid, total_interest_paid
+
+def iterative_schedule(principal, annual_interest_rate, months):
+    # Reference implementation: the original per-month loop from get_loan_schedule
+    monthly_rate = annual_interest_rate / 12.0
+
+    if monthly_rate > 0:
+        monthly_payment = principal * monthly_rate / (1 - math.pow(1 + monthly_rate, -months))
+    else:
+        monthly_payment = principal / months
+
+    balance = principal
+    balances = []
+
+    for month in range(1, months + 1):
+        interest = balance * monthly_rate
+        principal_payment = monthly_payment - interest
+        balance -= principal_payment
+        balance = max(balance, 0)
+        balances.append(balance)
+
+    return monthly_payment, balances
+
+def random_loans(seed, count, max_months=480, max_rate=0.3):
+    rng = random.Random(seed)
+    for _ in range(count):
+        months = rng.choice([1, 2, 12, 36, 60, 120, 180, 240, 360, rng.randint(1, max_months)])
+        annual_interest_rate = rng.choice([0.0, round(rng.uniform(0.0001, max_rate), 4)])
+        amount = round(rng.uniform(1, 2_000_000), 2)
+        month = rng.randint(1, months)
+        yield amount, annual_interest_rate, months, month
+
+def assert_same_cents(actual, expected, loan):
+    for a, e in zip(actual, expected):
+        if round(a, 2) == round(e, 2):
+            continue
+        # Exact half-cent ties (common with zero-rate loans) round either way
+        # depending on the last bits of float drift, so only accept values
+        # within 1e-6 of one, which is also how far apart they may be.
+        half_cents = e * 100 - 0.5
+        assert abs(half_cents - round(half_cents)) < 1e-4, loan
+        assert abs(a - e) < 1e-6, loan
+
+"""
+TESTS FOR CLOSED FORM MONTH SUMMARY
+"""
+@pytest.mark.parametrize("seed", range(20))
+def test_month_summary_matches_iterative_loop(seed):
+    for loan in random_loans(seed, 100):
+        assert_same_cents(month_summary(*loan), iterative_month_summary(*loan), loan)
+
+@pytest.mark.parametrize("seed", range(10))
+def test_month_summary_matches_iterative_loop_on_long_high_rate_terms(seed):
+    # Long terms at high rates are where the closed form's error grows fastest
+    for loan in random_loans(seed, 100, max_months=2400, max_rate=1.0):
+        assert_same_cents(month_summary(*loan), iterative_month_summary(*loan), loan)
+
+def test_month_summary_falls_back_to_loop_when_closed_form_drifts():
+    # The closed form is about $50 off the loop here
+    loan = (1_000_000, 0.3, 1200, 1199)
+    assert month_summary(*loan) == iterative_month_summary(*loan)
+
+def test_month_summary_final_month_is_clamped_to_zero():
+    for loan in random_loans(1234, 200):
+        amount, annual_interest_rate, months, _ = loan
+        balance, principal_paid, _ = month_summary(amount, annual_interest_rate, months, months)
+        assert balance >= 0
+        assert round(balance, 2) == 0
+        assert round(principal_paid, 2) == round(amount, 2)
+
+@pytest.mark.parametrize("loan", [(1000, 12.0, 2000, 1999), (1000, 0.3, 100000, 1), (1000, 0.3, 100000, 99999)])
+def test_month_summary_never_overflows(loan):
+    with np.errstate(all="raise"):
+        summary = month_summary(*loan)
+    assert all(math.isfinite(value) for value in summary)
+    assert summary == iterative_month_summary(*loan)
+    # No -0.0 from a closed form that cancels to a hair below zero
+    assert math.copysign(1, summary[1]) == 1
+
+def test_month_summary_zero_rate():
+    assert month_summary(1200, 0, 12, 5) == (700, 500, 0)
+
+"""
+TESTS FOR VECTORIZED SCHEDULE
+"""
+@pytest.mark.parametrize("seed", range(5))
+def test_amortization_schedule_matches_iterative_loop(seed):
+    for loan in random_loans(seed, 20):
+        amount, annual_interest_rate, months, _ = loan
+        expected_payment, expected_balances = iterative_schedule(amount, annual_interest_rate, months)
+        schedule = amortization_schedule(amount, annual_interest_rate, months)
+
+        assert round(schedule.monthly_payment, 2) == round(expected_payment, 2)
+        assert len(schedule.balances) == months
+        assert_same_cents(schedule.balances.tolist(), expected_balances, loan)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_amortization_schedule_matches_iterative_loop_on_long_high_rate_terms(seed):
+    for loan in random_loans(seed, 20, max_months=2400, max_rate=1.0):
+        amount, annual_interest_rate, months, _ = loan
+        _, expected_balances = iterative_schedule(amount, annual_interest_rate, months)
+        schedule = amortization_schedule(amount, annual_interest_rate, months)
+
+        assert all(np.isfinite(column).all() for column in schedule[1:])
+        assert_same_cents(schedule.balances.tolist(), expected_balances, loan)
+
+def test_amortization_schedule_agrees_with_month_summary():
+    for amount, annual_interest_rate, months in [(250_000, 0.065, 360), (5000, 0, 7), (1000, 0.05, 12), (1_000_000, 0.3, 1200), (1000, 12.0, 50)]:
+        schedule = amortization_schedule(amount, annual_interest_rate, months)
+        for month in range(1, months + 1):
+            assert (
+                schedule.balances[month - 1],
+                schedule.cumulative_principal[month - 1],
+                schedule.cumulative_interest[month - 1],
+            ) == month_summary(amount, annual_interest_rate, months, month)
+
+def test_balances_between_matches_full_schedule():
+    schedule = amortization_schedule(250_000, 0.065, 360)
+    assert balances_between(250_000, 0.065, 360, 1, 360).tolist() == schedule.balances.tolist()
+    assert balances_between(250_000, 0.065, 360, 100, 130).tolist() == schedule.balances[99:130].tolist()
+    assert balances_between(250_000, 0.065, 360, 12, 360, 12).tolist() == schedule.balances[11::12].tolist()
+
+    schedule = amortization_schedule(1_000_000, 0.3, 1200)
+    assert balances_between(1_000_000, 0.3, 1200, 100, 1199, 7).tolist() == schedule.balances[99:1199:7].tolist()
+
+"""
+TESTS FOR PORTFOLIO SUMMARIES
+"""
+def test_portfolio_month_summaries_match_month_summary():
+    loans = list(random_loans(99, 500))
+    amounts, rates, terms, _ = (np.array(column) for column in zip(*loans))
+    summaries = portfolio_month_summaries(amounts, rates, terms, 120)
+
+    for i, (amount, annual_interest_rate, months, _) in enumerate(loans):
+        month = min(months, 120)
+        balance, principal_paid, interest_paid = month_summary(amount, annual_interest_rate, months, month)
+        assert summaries["months"][i] == month
+        assert summaries["balances"][i] == pytest.approx(balance, abs=1e-6)
+        assert summaries["principal_paid"][i] == pytest.approx(principal_paid, abs=1e-6)
+        assert summaries["interest_paid"][i] == pytest.approx(interest_paid, abs=1e-6)
+
+        _, _, lifetime_interest = month_summary(amount, annual_interest_rate, months, months)
+        assert summaries["total_interest"][i] == pytest.approx(lifetime_interest, abs=1e-6)
+
+def test_portfolio_month_summaries_fall_back_to_loop():
+    loans = [(1_000_000, 0.3, 1200), (1000, 12.0, 2000), (250_000, 0.065, 360)]
+    amounts, rates, terms = (np.array(column) for column in zip(*loans))
+    summaries = portfolio_month_summaries(amounts, rates, terms, 1199)
+
+    for i, loan in enumerate(loans):
+        month = min(loan[2], 1199)
+        assert (summaries["balances"][i], summaries["principal_paid"][i], summaries["interest_paid"][i]) == month_summary(*loan, month)
+        assert summaries["total_interest"][i] == month_summary(*loan, loan[2])[2]
+
+"""
+TESTS FOR SCHEDULE CACHE
+"""
+def test_schedule_cache_hits_and_misses():
+    cache = ScheduleCache(max_entries=4)
+    first = cache.get(1000, 0.05, 12)
+    second = cache.get(1000, 0.05, 12)
+
+    assert first is second
+    assert cache.stats() == {"entries": 1, "bytes": schedule_nbytes(first), "hits": 1, "misses": 1, "evictions": 0}
+
+def test_schedule_cache_evicts_least_recently_used():
+    cache = ScheduleCache(max_entries=2)
+    cache.get(1000, 0.05, 12)
+    cache.get(2000, 0.05, 12)
+    cache.get(1000, 0.05, 12)
+    cache.get(3000, 0.05, 12)
+
+    assert cache.peek(2000, 0.05, 12) is None
+    assert cache.peek(1000, 0.05, 12) is not None
+    assert cache.stats()["evictions"] == 1
+
+def test_schedule_cache_respects_byte_budget():
+    one_entry = schedule_nbytes(amortization_schedule(1000, 0.05, 360))
+    cache = ScheduleCache(max_entries=100, max_bytes=one_entry * 2)
+    for amount in range(1000, 1005):
+        cache.get(amount, 0.05, 360)
+
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= one_entry * 2
+    assert stats["evictions"] == 3
+
+def test_schedule_cache_invalidate():
+    cache = ScheduleCache()
+    cache.get(1000, 0.05, 12)
+
+    assert cache.invalidate(1000, 0.05, 12)
+    assert not cache.invalidate(1000, 0.05, 12)
+    assert cache.peek(1000, 0.05, 12) is None
+    assert cache.stats()["bytes"] == 0
+
+@pytest.mark.parametrize("rounding", ["half_up", "half_even"])
+def test_cents_schedule_is_exact(rounding):
+    rng = random.Random(rounding)
+    for _ in range(500):
+        principal = round(rng.uniform(100, 2000000), 2)
+        rate = round(rng.uniform(0, 0.25), 4)
+        months = rng.randint(1, 480)
+        schedule = cents_schedule(principal, rate, months, rounding)
+
+        assert schedule.principal.sum() == round(principal * 100)
+        assert schedule.payments.sum() == schedule.principal.sum() + schedule.interest.sum()
+        assert schedule.cumulative_interest[-1] == schedule.interest.sum()
+        assert schedule.balances[-1] == 0
+        assert (schedule.balances >= 0).all()
+        assert schedule.balances.dtype == np.int64
+
+def test_cents_schedule_adjusts_final_payment():
+    schedule = cents_schedule(1000, 0.05, 12)
+    assert schedule.monthly_payment == 8561
+    assert (schedule.payments[:-1] == 8561).all()
+    assert schedule.payments[-1] == 8559
+    assert schedule.interest.sum() == 2730
+
+def test_cents_schedule_rounding_policies():
+    # 500 cents at 0.5% a month is exactly 2.5 cents of interest
+    assert cents_schedule(5, 0.06, 12, "half_up").interest[0] == 3
+    assert cents_schedule(5, 0.06, 12, "half_even").interest[0] == 2
+
+def reference_cents_interest(schedule, annual_interest_rate, rounding):
+    # Each month's interest straight from the definition, with exact fractions
+    opening = [schedule.balances[0] + schedule.principal[0]] + schedule.balances[:-1].tolist()
+    rate = Fraction(round(annual_interest_rate * 10 ** 9), 12 * 10 ** 9)
+    interest = []
+    for balance in opening:
+        owed = balance * rate
+        whole = math.floor(owed)
+        if owed - whole > Fraction(1, 2) or (owed - whole == Fraction(1, 2) and (rounding == "half_up" or whole % 2)):
+            whole += 1
+        interest.append(whole)
+    return interest
+
+@pytest.mark.parametrize("rounding", ["half_up", "half_even"])
+def test_cents_schedule_interest_matches_definition(rounding):
+    rng = random.Random(rounding)
+    for _ in range(300):
+        # Rates that are simple fractions a month make exact half-cent ties common
+        annual_interest_rate = rng.choice([0.06, 0.12, 0.24, 0.065, 1.2, round(rng.uniform(0, 0.3), 4)])
+        schedule = cents_schedule(rng.choice([rng.randint(1, 100000) / 2, round(rng.uniform(100, 500000), 2)]), annual_interest_rate, rng.randint(1, 480), rounding)
+        paid = np.count_nonzero(schedule.payments)
+        assert schedule.interest[:paid].tolist() == reference_cents_interest(schedule, annual_interest_rate, rounding)[:paid]
+
+def test_cents_schedule_zero_rate():
+    schedule = cents_schedule(1000, 0, 3)
+    assert schedule.payments.tolist() == [33333, 33333, 33334]
+    assert schedule.interest.sum() == 0
+
+def test_cents_schedule_with_invalid_rounding():
+    with pytest.raises(ValueError):
+        cents_schedule(1000, 0.05, 12, "up")
+
+def test_scenarios_baseline_matches_schedule():
+    annual_rates, extra_principal = scenario_arrays(0.065, 360, [(0, (), ())])
+    results = evaluate_scenarios(250000, 360, annual_rates, extra_principal, keep_schedules=True)
+    schedule = amortization_schedule(250000, 0.065, 360)
+
+    assert results.payoff_months.tolist() == [360]
+    assert results.total_interest[0] == pytest.approx(schedule.cumulative_interest[-1])
+    assert np.allclose(results.balances[0], schedule.balances, atol=1e-6)
+    assert results.balances[0, -1] == 0
+
+def test_scenarios_extra_payments_pay_off_early():
+    annual_rates, extra_principal = scenario_arrays(0.05, 12, [(0, (), ()), (100, (), ()), (0, [(3, 500), (3, 500)], ())])
+    results = evaluate_scenarios(1000, 12, annual_rates, extra_principal, keep_schedules=True)
+
+    assert results.payoff_months.tolist() == [12, 6, 3]
+    assert results.total_interest[1] < results.total_interest[0]
+    # Payments are capped at what's owed, so the payoff month clears the balance exactly
+    assert results.balances[2, 2] == 0
+    assert (results.payments[2, 3:] == 0).all()
+    assert results.principal.sum(axis=1) == pytest.approx([1000, 1000, 1000])
+
+def test_scenarios_rate_change_reamortizes():
+    annual_rates, extra_principal = scenario_arrays(0.05, 24, [(0, (), [(13, 0.08)])])
+    results = evaluate_scenarios(1000, 24, annual_rates, extra_principal, keep_schedules=True)
+    before = amortization_schedule(1000, 0.05, 24)
+    after = amortization_schedule(before.balances[11], 0.08, 12)
+
+    assert results.payments[0, 0] == pytest.approx(before.monthly_payment)
+    assert results.payments[0, 12] == pytest.approx(after.monthly_payment)
+    assert results.payoff_months.tolist() == [24]
+
+def test_scenarios_zero_rate():
+    annual_rates, extra_principal = scenario_arrays(0.05, 4, [(0, (), [(1, 0)])])
+    results = evaluate_scenarios(1000, 4, annual_rates, extra_principal)
+
+    assert results.total_interest.tolist() == [0]
+    assert results.total_paid.tolist() == [1000]
+
+shared_store_available = pytest.mark.skipif(fcntl is None, reason="the shared schedule store needs fcntl")
+
+@pytest.fixture
+def shared_store():
+    store = SharedScheduleStore(f"test-{uuid.uuid4().hex[:8]}", slots=2, max_months=360)
+    yield store
+    store.unlink()
+
+@shared_store_available
+def test_shared_store_reads_what_was_put(shared_store):
+    schedule = amortization_schedule(1000, 0.05, 360)
+    assert shared_store.balances(1000, 0.05, 360) is None
+
+    assert shared_store.put(1000, 0.05, 360, schedule)
+    assert np.array_equal(shared_store.balances(1000, 0.05, 360), schedule.balances)
+    assert np.array_equal(shared_store.balances(1000, 0.05, 360, 12, 360, 12), schedule.balances[11::12])
+    assert shared_store.month(1000, 0.05, 360, 10) == (schedule.balances[9], schedule.cumulative_principal[9], schedule.cumulative_interest[9])
+    assert shared_store.month(1000, 0.06, 360, 10) is None
+
+    # Longer than max_months: refused, so callers can cache it elsewhere
+    assert not shared_store.put(1000, 0.05, 361, amortization_schedule(1000, 0.05, 361))
+
+@shared_store_available
+def test_shared_store_evicts_least_recently_used(shared_store):
+    for amount in (1000, 2000):
+        shared_store.put(amount, 0.05, 12, amortization_schedule(amount, 0.05, 12))
+    shared_store.balances(1000, 0.05, 12)
+    shared_store.put(3000, 0.05, 12, amortization_schedule(3000, 0.05, 12))
+
+    assert shared_store.balances(2000, 0.05, 12) is None
+    assert shared_store.balances(1000, 0.05, 12) is not None
+    assert shared_store.stats()["evictions"] == 1
+
+    shared_store.clear()
+    assert shared_store.stats()["entries"] == 0
+
+@shared_store_available
+def test_shared_store_ignores_segment_from_other_layout_version(shared_store, monkeypatch):
+    shared_store.put(1000, 0.05, 12, amortization_schedule(1000, 0.05, 12))
+
+    monkeypatch.setattr(shared_store_module, "LAYOUT_VERSION", shared_store_module.LAYOUT_VERSION + 1)
+    upgraded = SharedScheduleStore(shared_store.name, slots=2, max_months=360)
+    try:
+        assert upgraded.segment_name != shared_store.segment_name
+        assert upgraded.balances(1000, 0.05, 12) is None
+        assert upgraded.stats()["entries"] == 0
+    finally:
+        upgraded.unlink()
+    assert shared_store.balances(1000, 0.05, 12) is not None
+
+# Writes schedules with rotating terms into a 2-slot store, so every put evicts
+WRITER_SCRIPT = """
+import sys, time
+from amortization.calculations import amortization_schedule
+from amortization.shared_store import SharedScheduleStore
+
+store = SharedScheduleStore(sys.argv[1], slots=2, max_months=360)
+deadline = time.monotonic() + float(sys.argv[2])
+amount = 0
+while time.monotonic() < deadline:
+    amount = amount % 5 + 1
+    store.put(amount * 1000, 0.05, 360, amortization_schedule(amount * 1000, 0.05, 360))
+store.close()
+"""
+
+@shared_store_available
+def test_shared_store_across_processes(shared_store):
+    writers = [subprocess.Popen([sys.executable, "-c", WRITER_SCRIPT, shared_store.name, "1"]) for _ in range(2)]
+    expected = {amount * 1000: amortization_schedule(amount * 1000, 0.05, 360).balances for amount in range(1, 6)}
+
+    hits = 0
+    try:
+        deadline = time.monotonic() + 1
+        while time.monotonic() < deadline:
+            for amount, balances in expected.items():
+                read = shared_store.balances(amount, 0.05, 360)
+                if read is not None:
+                    # Concurrent evictions must never surface a torn or mismatched schedule
+                    assert np.array_equal(read, balances)
+                    hits += 1
+    finally:
+        for writer in writers:
+            writer.wait(timeout=10)
+
+    assert all(writer.returncode == 0 for writer in writers)
+    assert hits > 0
+
+def test_checkpoint_index_is_bit_identical_to_loop():
+    index = CheckpointIndex(every=16)
+    for loan in random_loans(5, 1000):
+        # Exact equality, not approx: same floats (and the loop's integer 0 after a clamp)
+        assert index.month_summary(*loan) == iterative_month_summary(*loan), loan
+
+def test_checkpoint_index_clamps_like_loop():
+    # Zero-rate loans drift a hair below zero on the last payment, which the loop clamps
+    index = CheckpointIndex(every=7)
+    for months in range(1, 200):
+        assert index.month_summary(1000.01, 0.0, months, months) == iterative_month_summary(1000.01, 0.0, months, months)
+
+def test_checkpoint_index_bounds_iterations():
+    index = CheckpointIndex(every=32)
+    index.month_summary(100000, 0.05, 5000, 5000)
+    built = index.stats()["iterations"]
+    assert built == 5000
+
+    for month in (4999, 1, 2500, 3333):
+        before = index.stats()["iterations"]
+        index.month_summary(100000, 0.05, 5000, month)
+        assert index.stats()["iterations"] - before < 32
+    assert index.stats()["checkpoints"] == 5000 // 32 + 1
+
+def test_checkpoint_index_evicts_least_recently_used():
+    index = CheckpointIndex(every=4, max_entries=2)
+    index.month_summary(1000, 0.05, 12, 12)
+    index.month_summary(2000, 0.05, 12, 12)
+    index.month_summary(1000, 0.05, 12, 6)
+    index.month_summary(3000, 0.05, 12, 12)
+
+    stats = index.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
@@ -1,6 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import numpy as np
+import pytest
+from fastapi.responses import JSONResponse
 from fastapi.testclient import TestClient
-from main import app
+from sqlalchemy import event
+
+from sqlalchemy.orm import sessionmaker
 
+import main
+from main import PACKED_SCHEDULE_HEADER, FastJSONResponse, app, orjson_safe, schedule_rows
+from amortization.cache import schedule_cache
+from database.cache import LoanCache, LoanRow, loan_cache
+from amortization.calculations import amortization_schedule, monthly_payment
+from amortization.checkpoints import CheckpointIndex
+from amortization.shared_store import SharedScheduleStore, fcntl
+from database.database import Base, create_tables, engine, make_engine
+from database import queries
+from database.group_commit import GroupCommitWriter
+from database.invalidation import ChangeLogInvalidation
+from database.materialization import ScheduleMaterializer, pack_schedule, unpack_schedule
+from database.models import Users, Loans, LoanSchedules
+
+# TestClient only runs startup events inside a `with` block, so create/migrate tables here
+create_tables()
 client = TestClient(app)
 
 """
@@ -16,6 +44,19 @@ def test_create_user_with_existing_email():
     assert response.status_code == 409
     assert response.json() == {"detail": "Email already exists"}
 
+def test_create_users_batch():
+    email = f"{uuid.uuid4().hex}@test.com"
+    response = client.post("/v1/users:batch", json={"users": [
+        {"email_address": "test@test.com"},
+        {"email_address": email},
+        {"email_address": email},
+    ]})
+    assert response.status_code == 201
+    users = response.json()["users"]
+    assert users[0] == {"error": "Email already exists"}
+    assert isinstance(users[1]["user_id"], int)
+    assert users[2] == {"error": "Email already exists"}
+
 """
 TESTS FOR CREATE LOAN
 """
@@ -34,6 +75,23 @@ def test_create_loan_user_not_found():
     assert response.status_code == 404
     assert response.json() == {"detail": "User with id 100 not found"}
 
+def test_create_loans_batch():
+    response = client.post("/v1/users/1/loans:batch", json={"loans": [
+        {"amount": 1000, "annual_interest_rate": 0.05, "loan_term_in_months": 12},
+        {"amount": -1000, "annual_interest_rate": 0.05, "loan_term_in_months": 12},
+        {"amount": 2000, "annual_interest_rate": 0.04, "loan_term_in_months": 24},
+    ]})
+    assert response.status_code == 201
+    loans = response.json()["loans"]
+    assert loans[1] == {"error": "Invalid loan parameters"}
+    assert loans[2]["loan_id"] == loans[0]["loan_id"] + 1
+    assert loans[2] == {"loan_id": loans[2]["loan_id"], "owner_id": 1, "amount": 2000, "annual_interest_rate": 0.04, "loan_term_in_months": 24}
+
+def test_create_loans_batch_user_not_found():
+    response = client.post("/v1/users/100/loans:batch", json={"loans": []})
+    assert response.status_code == 404
+    assert response.json() == {"detail": "User with id 100 not found"}
+
 """
 TESTS FOR GET LOANS
 """
@@ -157,6 +215,21 @@ def test_pagination_and_get_next_page():
         "offset": 20
     }
 
+def test_cursor_pagination_and_get_next_page():
+    response = client.get("/v1/users/1/loans?limit=10&cursor=")
+    assert response.status_code == 200
+    first_page = response.json()
+    assert first_page["loans"] == [{"loan_id": loan_id} for loan_id in range(1, 11)]
+
+    response = client.get(f"/v1/users/1/loans?limit=10&cursor={first_page['next_cursor']}")
+    assert response.status_code == 200
+    assert response.json()["loans"] == [{"loan_id": loan_id} for loan_id in range(11, 21)]
+
+def test_cursor_pagination_with_invalid_cursor():
+    response = client.get("/v1/users/1/loans?cursor=not-a-cursor")
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Invalid cursor"}
+
 """
 TESTS FOR LOAN SHARING
 """
@@ -197,6 +270,53 @@ def test_share_loan_when_shared_with_user_id_not_found():
     assert response.status_code == 404
     assert response.json() == {"detail": "User with id 100 not found"}
 
+def create_shared_loan():
+    owner_id = client.post("/v1/users", json={"email_address": f"{uuid.uuid4().hex}@test.com"}).json()["user_id"]
+    other_id = client.post("/v1/users", json={"email_address": f"{uuid.uuid4().hex}@test.com"}).json()["user_id"]
+    loan_id = client.post(f"/v1/users/{owner_id}/loans", json={"amount": 1000, "annual_interest_rate": 0.05, "loan_term_in_months": 12}).json()["loan_id"]
+    return owner_id, other_id, loan_id
+
+def test_revoke_loan_share():
+    owner_id, other_id, loan_id = create_shared_loan()
+    client.patch(f"/v1/users/{owner_id}/loans/{loan_id}/share/{other_id}")
+    assert client.get(f"/v1/users/{other_id}/loans/{loan_id}/schedule/1").status_code == 200
+
+    response = client.delete(f"/v1/users/{owner_id}/loans/{loan_id}/share/{other_id}")
+    assert response.status_code == 200
+    assert response.json() == {"loan_id": loan_id, "shared_with": {"user_ids": []}}
+    # The cached decision is dropped too
+    assert client.get(f"/v1/users/{other_id}/loans/{loan_id}/schedule/1").status_code == 403
+
+def test_revoke_loan_share_when_not_shared():
+    owner_id, other_id, loan_id = create_shared_loan()
+    response = client.delete(f"/v1/users/{owner_id}/loans/{loan_id}/share/{other_id}")
+    assert response.status_code == 404
+    assert response.json() == {"detail": f"Loan is not shared with user {other_id}"}
+
+def test_revoke_loan_share_when_user_is_not_the_loan_owner():
+    owner_id, other_id, loan_id = create_shared_loan()
+    response = client.delete(f"/v1/users/{other_id}/loans/{loan_id}/share/{owner_id}")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "You do not have permission to revoke this share"}
+
+def test_get_shared_loans():
+    response = client.get("/v1/users/2/shared-loans")
+    assert response.status_code == 200
+    assert response.json() == {
+        "loans": [
+            {"loan_id": 1},
+            {"loan_id": 4},
+            {"loan_id": 10},
+            {"loan_id": 11}
+        ],
+        "offset": 4
+    }
+
+def test_get_shared_loans_when_user_id_not_found():
+    response = client.get("/v1/users/100/shared-loans")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "User with id 100 not found"}
+
 """
 TESTS FOR LOAN SCHEDULE
 """
@@ -268,6 +388,61 @@ def test_get_loan_schedule():
         ]
     }
 
+def test_get_loan_schedule_streamed_as_ndjson():
+    expected = client.get("/v1/users/1/loans/1/schedule").json()["schedule"]
+    response = client.get("/v1/users/1/loans/1/schedule", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in response.text.splitlines()] == expected
+
+def test_get_loan_schedule_streamed_as_json_array():
+    expected = client.get("/v1/users/1/loans/1/schedule").json()
+    response = client.get("/v1/users/1/loans/1/schedule?stream=1")
+    assert response.status_code == 200
+    assert response.json() == expected
+
+@pytest.mark.parametrize("query, headers", [("", {}), ("?stream=1", {}), ("", {"Accept": "application/x-ndjson"})])
+def test_get_loan_schedule_final_balance_is_float(query, headers):
+    # The original loop sent an int 0 for this loan, as its balance overshot below zero
+    response = client.get(f"/v1/users/1/loans/1/schedule{query}", headers=headers)
+    assert response.status_code == 200
+    assert response.text.replace(" ", "").rstrip("]}\n").endswith('"remaining_balance":0.0')
+
+def test_get_loan_schedule_json_matches_stdlib_encoding():
+    response = client.get("/v1/users/1/loans/1/schedule")
+    assert response.content == JSONResponse(response.json()).body
+
+@pytest.mark.parametrize("amount", [1000.0, 2.5e16])
+def test_fast_json_response_matches_json_response(amount):
+    content = {"schedule": schedule_rows(amount, 0.05, 12)}
+    use_orjson = orjson_safe(amount, monthly_payment(amount, 0.05, 12))
+    assert FastJSONResponse(content, use_orjson=use_orjson).body == JSONResponse(content).body
+
+def test_get_loan_schedule_as_msgpack():
+    msgpack = pytest.importorskip("msgpack")
+    expected = client.get("/v1/users/1/loans/1/schedule?from_month=2&step=3").json()["schedule"]
+    response = client.get("/v1/users/1/loans/1/schedule?from_month=2&step=3", headers={"Accept": "application/msgpack"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+
+    body = msgpack.unpackb(response.content)
+    balances = np.frombuffer(body["remaining_balance_cents"], dtype="<i8")
+    assert (body["from_month"], body["step"], body["count"]) == (2, 3, len(expected))
+    assert body["monthly_payment_cents"] == round(expected[0]["monthly_payment"] * 100)
+    assert balances.tolist() == [round(row["remaining_balance"] * 100) for row in expected]
+
+def test_get_loan_schedule_as_octet_stream():
+    expected = client.get("/v1/users/1/loans/1/schedule").json()["schedule"]
+    response = client.get("/v1/users/1/loans/1/schedule", headers={"Accept": "application/octet-stream"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+
+    from_month, step, count, payment_cents = PACKED_SCHEDULE_HEADER.unpack_from(response.content)
+    balances = np.frombuffer(response.content, dtype="<i8", offset=PACKED_SCHEDULE_HEADER.size)
+    assert (from_month, step, count) == (1, 1, len(expected))
+    assert payment_cents == round(expected[0]["monthly_payment"] * 100)
+    assert balances.tolist() == [round(row["remaining_balance"] * 100) for row in expected]
+
 def test_get_loan_summary_when_not_shared_with_user():
     response = client.get("/v1/users/100/loans/1/schedule/10")
     assert response.status_code == 404
@@ -278,6 +453,64 @@ def test_get_loan_schedule_with_invalid_loan_id():
     assert response.status_code == 404
     assert response.json() == {"detail": "Loan with id 100 not found"}
 
+def test_get_loan_schedule_month_range():
+    full_schedule = client.get("/v1/users/1/loans/1/schedule").json()["schedule"]
+    response = client.get("/v1/users/1/loans/1/schedule?from_month=2&to_month=11&step=3")
+    assert response.status_code == 200
+    assert response.json() == {"schedule": full_schedule[1:11:3]}
+
+def test_get_loan_schedule_month_range_streamed():
+    full_schedule = client.get("/v1/users/1/loans/1/schedule").json()["schedule"]
+    response = client.get("/v1/users/1/loans/1/schedule?from_month=6&step=2", headers={"Accept": "application/x-ndjson"})
+    assert [json.loads(line) for line in response.text.splitlines()] == full_schedule[5::2]
+
+def test_get_loan_schedule_with_invalid_month_range():
+    response = client.get("/v1/users/1/loans/1/schedule?from_month=5&to_month=13")
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Month must be between 1 and 12"}
+
+    response = client.get("/v1/users/1/loans/1/schedule?step=0")
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Step must be at least 1"}
+
+@pytest.mark.parametrize("query", ["from_month=0", "to_month=0", "from_month=0&to_month=0"])
+def test_get_loan_schedule_with_month_zero(query):
+    response = client.get(f"/v1/users/1/loans/1/schedule?{query}")
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Month must be between 1 and 12"}
+
+def test_get_loan_schedules_batch():
+    full_schedule = client.get("/v1/users/1/loans/1/schedule").json()["schedule"]
+    response = client.post("/v1/users/1/schedules:batch", json={"loans": [
+        {"loan_id": 1},
+        {"loan_id": 4, "from_month": 3, "to_month": 5},
+        {"loan_id": 100},
+        {"loan_id": 1, "from_month": 10, "to_month": 13},
+    ]})
+    assert response.status_code == 200
+    assert response.json() == {"schedules": [
+        {"loan_id": 1, "schedule": full_schedule},
+        {"loan_id": 4, "schedule": full_schedule[2:5]},
+        {"loan_id": 100, "error": "Loan with id 100 not found"},
+        {"loan_id": 1, "error": "Month must be between 1 and 12"},
+    ]}
+
+def test_get_loan_schedules_batch_with_month_zero():
+    response = client.post("/v1/users/1/schedules:batch", json={"loans": [
+        {"loan_id": 1, "from_month": 0},
+        {"loan_id": 1, "to_month": 0},
+    ]})
+    assert response.status_code == 200
+    assert response.json() == {"schedules": [
+        {"loan_id": 1, "error": "Month must be between 1 and 12"},
+        {"loan_id": 1, "error": "Month must be between 1 and 12"},
+    ]}
+
+def test_get_loan_schedules_batch_when_not_shared_with_user():
+    response = client.post("/v1/users/3/schedules:batch", json={"loans": [{"loan_id": 10}]})
+    assert response.status_code == 200
+    assert response.json() == {"schedules": [{"loan_id": 10, "error": "Loan is not shared with user"}]}
+
 """
 TESTS FOR LOAN SUMMARY
 """
@@ -292,6 +525,18 @@ def test_get_loan_summary():
         "aggregate_interest_paid": 26.23
     }
 
+@pytest.mark.parametrize("checkpoints", [None, CheckpointIndex(every=4)])
+def test_get_loan_summary_final_month_balance_is_float(monkeypatch, checkpoints):
+    # The checkpointed loop clamps to an int 0 here, but whichever path serves
+    # the month, the response model sends a paid-off balance as 0.0
+    monkeypatch.setattr(main, "summary_checkpoints", checkpoints)
+    schedule_cache.clear()
+    for _ in range(2):
+        response = client.get("/v1/users/1/loans/1/schedule/12")
+        assert response.status_code == 200
+        assert '"principal_balance":0.0' in response.text.replace(" ", "")
+        client.get("/v1/users/1/loans/1/schedule")
+
 def test_get_loan_summary_when_not_shared_with_user():
     response = client.get("/v1/users/3/loans/10/schedule/10")
     assert response.status_code == 403
@@ -305,4 +550,481 @@ def test_get_loan_summary_with_invalid_month():
 def test_get_loan_summary_with_invalid_loan_id():
     response = client.get("/v1/users/1/loans/100/schedule/10")
     assert response.status_code == 404
-    assert response.json() == {"detail": "Loan with id 100 not found"}
\ No newline at end of file
+    assert response.json() == {"detail": "Loan with id 100 not found"}
+
+@pytest.mark.skipif(fcntl is None, reason="the shared schedule store needs fcntl")
+def test_schedule_endpoints_use_shared_store(monkeypatch):
+    expected_schedule = client.get("/v1/users/1/loans/1/schedule").json()
+    expected_summary = client.get("/v1/users/1/loans/1/schedule/10").json()
+
+    store = SharedScheduleStore(f"test-{uuid.uuid4().hex[:8]}", slots=4, max_months=360)
+    monkeypatch.setattr(main, "shared_schedule_store", store)
+    # With SUMMARY_CHECKPOINTS=1 the month summary would skip the store
+    monkeypatch.setattr(main, "summary_checkpoints", None)
+    schedule_cache.clear()
+    try:
+        # Computed once into the shared store rather than this process's cache
+        assert client.get("/v1/users/1/loans/1/schedule").json() == expected_schedule
+        assert schedule_cache.stats()["entries"] == 0
+        assert store.stats()["entries"] == 1
+
+        assert client.get("/v1/users/1/loans/1/schedule").json() == expected_schedule
+        assert client.get("/v1/users/1/loans/1/schedule?from_month=2&to_month=11&step=3").json()["schedule"] == expected_schedule["schedule"][1:11:3]
+        assert client.get("/v1/users/1/loans/1/schedule/10").json() == expected_summary
+        assert store.stats()["hits"] == 3
+    finally:
+        store.unlink()
+
+@pytest.mark.skipif(fcntl is None, reason="the shared schedule store needs fcntl")
+def test_schedules_batch_uses_shared_store(monkeypatch):
+    expected = client.get("/v1/users/1/loans/1/schedule").json()["schedule"]
+
+    store = SharedScheduleStore(f"test-{uuid.uuid4().hex[:8]}", slots=4, max_months=360)
+    monkeypatch.setattr(main, "shared_schedule_store", store)
+    schedule_cache.clear()
+    try:
+        client.get("/v1/users/1/loans/1/schedule")
+        response = client.post("/v1/users/1/schedules:batch", json={"loans": [{"loan_id": 1}, {"loan_id": 1, "from_month": 3, "to_month": 5}]})
+        assert response.json() == {"schedules": [{"loan_id": 1, "schedule": expected}, {"loan_id": 1, "schedule": expected[2:5]}]}
+        # Read from the store, not recomputed into this process's cache
+        assert store.stats()["hits"] == 2
+        assert schedule_cache.stats()["entries"] == 0
+    finally:
+        store.unlink()
+
+@pytest.mark.skipif(fcntl is None, reason="the shared schedule store needs fcntl")
+def test_schedule_longer_than_shared_store_is_cached_locally(monkeypatch):
+    loan_id = client.post("/v1/users/1/loans", json={"amount": 5000, "annual_interest_rate": 0.05, "loan_term_in_months": 400}).json()["loan_id"]
+
+    store = SharedScheduleStore(f"test-{uuid.uuid4().hex[:8]}", slots=4, max_months=360)
+    monkeypatch.setattr(main, "shared_schedule_store", store)
+    schedule_cache.clear()
+    try:
+        expected = client.get(f"/v1/users/1/loans/{loan_id}/schedule").json()
+        assert len(expected["schedule"]) == 400
+        assert store.stats()["entries"] == 0
+        assert schedule_cache.stats()["entries"] == 1
+
+        hits = schedule_cache.stats()["hits"]
+        assert client.get(f"/v1/users/1/loans/{loan_id}/schedule").json() == expected
+        assert schedule_cache.stats()["hits"] == hits + 1
+    finally:
+        store.unlink()
+
+def test_get_loan_summary_from_checkpoints(monkeypatch):
+    monkeypatch.setattr(main, "summary_checkpoints", CheckpointIndex(every=4))
+    response = client.get("/v1/users/1/loans/1/schedule/10")
+    assert response.status_code == 200
+    assert response.json() == {
+        "loan_id": 1,
+        "month": 10,
+        "principal_balance": 170.15,
+        "aggregate_principal_paid": 829.85,
+        "aggregate_interest_paid": 26.23
+    }
+    assert main.summary_checkpoints.stats()["checkpoints"] == 3
+
+def test_get_loan_schedule_exact():
+    response = client.get("/v1/users/1/loans/1/schedule?exact=1")
+    assert response.status_code == 200
+    schedule = response.json()["schedule"]
+    assert schedule[0] == {"month": 1, "monthly_payment": 85.61, "remaining_balance": 918.56, "principal": 81.44, "interest": 4.17}
+    # The final payment absorbs the rounding, and the principal parts add up to the loan amount
+    assert schedule[-1] == {"month": 12, "monthly_payment": 85.59, "remaining_balance": 0.0, "principal": 85.23, "interest": 0.36}
+    assert sum(round(row["principal"] * 100) for row in schedule) == 100000
+
+def test_get_loan_summary_exact_matches_schedule():
+    schedule = client.get("/v1/users/1/loans/1/schedule?exact=1&rounding=half_even").json()["schedule"]
+    response = client.get("/v1/users/1/loans/1/schedule/10?exact=1&rounding=half_even")
+    assert response.status_code == 200
+    summary = response.json()
+    assert summary["principal_balance"] == schedule[9]["remaining_balance"]
+    assert summary["aggregate_interest_paid"] == round(sum(row["interest"] for row in schedule[:10]), 2)
+    assert summary["aggregate_principal_paid"] + summary["principal_balance"] == pytest.approx(1000)
+
+@pytest.mark.parametrize("path", ["/v1/users/1/loans/1/schedule?exact=1&rounding=up", "/v1/users/1/loans/1/schedule/10?exact=1&rounding=up"])
+def test_exact_mode_with_invalid_rounding(path):
+    response = client.get(path)
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Rounding must be one of half_up, half_even"}
+
+def test_exact_mode_is_json_only():
+    response = client.get("/v1/users/1/loans/1/schedule?exact=1&stream=1")
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Exact mode is only available as a plain JSON response"}
+
+def test_evaluate_loan_scenarios():
+    response = client.post("/v1/users/1/loans/1/scenarios", json={"scenarios": [
+        {"name": "extra", "extra_monthly_principal": 100},
+        {"lump_sums": [{"month": 3, "amount": 500}], "rate_changes": [{"month": 6, "annual_interest_rate": 0.1}]}
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["baseline"] == {"payoff_month": 12, "total_interest": 27.29, "total_paid": 1027.29}
+    assert body["scenarios"][0] == {
+        "name": "extra",
+        "payoff_month": 6,
+        "total_interest": 13.6,
+        "total_paid": 1013.6,
+        "months_saved": 6,
+        "interest_saved": 13.69
+    }
+    assert "schedule" not in body["scenarios"][1]
+
+def test_evaluate_loan_scenarios_with_schedules():
+    response = client.post("/v1/users/1/loans/1/scenarios", json={"scenarios": [{"extra_monthly_principal": 100}], "include_schedules": True})
+    assert response.status_code == 200
+    schedule = response.json()["scenarios"][0]["schedule"]
+    assert len(schedule) == 6
+    assert schedule[0] == {"month": 1, "payment": 185.61, "principal": 181.44, "interest": 4.17, "remaining_balance": 818.56}
+    assert schedule[-1]["remaining_balance"] == 0
+
+def test_evaluate_loan_scenarios_with_invalid_month():
+    response = client.post("/v1/users/1/loans/1/scenarios", json={"scenarios": [{}, {"lump_sums": [{"month": 13, "amount": 500}]}]})
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Scenario 1: Month must be between 1 and 12"}
+
+def test_evaluate_loan_scenarios_when_not_shared_with_user():
+    response = client.post("/v1/users/3/loans/10/scenarios", json={"scenarios": []})
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Loan is not shared with user"}
+
+"""
+TESTS FOR PORTFOLIO
+"""
+def test_get_portfolio():
+    response = client.get("/v1/users/2/portfolio?month=10")
+    assert response.status_code == 200
+    portfolio = response.json()
+    assert [loan["loan_id"] for loan in portfolio["loans"]] == [1, 4, 10, 11]
+    assert portfolio["loans"][0] == {
+        "loan_id": 1,
+        "month": 10,
+        "principal_balance": 170.15,
+        "aggregate_principal_paid": 829.85,
+        "aggregate_interest_paid": 26.23,
+        "total_interest": 27.29
+    }
+    assert portfolio["totals"]["loan_count"] == 4
+    assert portfolio["totals"]["principal_balance"] == pytest.approx(
+        sum(loan["principal_balance"] for loan in portfolio["loans"]), abs=0.01
+    )
+
+def test_get_portfolio_when_user_id_not_found():
+    response = client.get("/v1/users/100/portfolio?month=10")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "User with id 100 not found"}
+
+def test_get_portfolio_with_invalid_month():
+    response = client.get("/v1/users/1/portfolio?month=0")
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Month must be at least 1"}
+
+"""
+TESTS FOR STATEMENTS PER REQUEST
+"""
+@pytest.fixture
+def statements():
+    # Count statements for cold requests, not ones answered by the loan cache
+    loan_cache.clear()
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+def test_create_user_statement_count(statements):
+    response = client.post("/v1/users", json={"email_address": f"{uuid.uuid4().hex}@test.com"})
+    assert response.status_code == 201
+    assert len(statements) == 1  # was 2: INSERT + refresh SELECT
+
+def test_create_loan_statement_count(statements):
+    response = client.post("/v1/users/1/loans", json={"amount": 1000, "annual_interest_rate": 0.05, "loan_term_in_months": 12})
+    assert response.status_code == 201
+    assert len(statements) == 1  # was 3: user SELECT + INSERT + refresh SELECT
+
+def test_get_loans_statement_count(statements):
+    assert client.get("/v1/users/1/loans").status_code == 200
+    assert client.get("/v1/users/1/loans?cursor=").status_code == 200
+    assert len(statements) == 2  # was 2 per request: user SELECT + loans SELECT
+
+def test_share_loan_statement_count(statements):
+    new_user = client.post("/v1/users", json={"email_address": f"{uuid.uuid4().hex}@test.com"}).json()
+    statements.clear()
+
+    response = client.patch(f"/v1/users/1/loans/1/share/{new_user['user_id']}")
+    assert response.status_code == 200
+    assert new_user["user_id"] in response.json()["shared_with"]["user_ids"]
+    # was 6: loan, access, target access, user SELECTs + INSERT + refresh; the third is the cache_invalidations INSERT
+    assert len(statements) == 3
+
+@pytest.mark.parametrize("path", ["/v1/users/1/loans/1/schedule", "/v1/users/1/loans/1/schedule/10"])
+def test_schedule_statement_count(statements, path):
+    assert client.get(path).status_code == 200
+    assert len(statements) == 1  # was 2: loan SELECT + share EXISTS
+
+"""
+TESTS FOR CROSS-PROCESS CACHE INVALIDATION
+"""
+def test_changelog_invalidation_poll():
+    cache = LoanCache()
+    channel = ChangeLogInvalidation(cache, sessionmaker(bind=engine), poll_seconds=3600)
+    channel.start()
+    try:
+        cache.put(2, LoanRow(10, 1, 1000, 0.05, 12), False)
+        with sessionmaker(bind=engine)() as db:
+            db.execute(channel.statement(10, 2))
+            db.commit()
+
+        assert channel.poll() == 1
+        assert cache.get(2, 10) is None
+        assert channel.poll() == 0
+    finally:
+        channel.stop()
+
+# A second worker process serving GETs from its own loan cache, one path per stdin line
+WORKER_SCRIPT = """
+import sys
+from fastapi.testclient import TestClient
+from main import app
+
+with TestClient(app) as client:
+    for path in sys.stdin:
+        print(client.get(path.strip()).status_code, flush=True)
+"""
+
+def test_share_and_revoke_reach_other_processes():
+    owner_id, other_id, loan_id = create_shared_loan()
+    path = f"/v1/users/{other_id}/loans/{loan_id}/schedule/1"
+    # A TTL far past the test, so only the invalidation channel can refresh the worker's cache
+    env = dict(os.environ, DATABASE_ECHO="0", CACHE_INVALIDATION="changelog", INVALIDATION_POLL_SECONDS="0.05", LOAN_CACHE_TTL_SECONDS="3600")
+    worker = subprocess.Popen([sys.executable, "-c", WORKER_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+
+    def worker_status() -> int:
+        worker.stdin.write(path + "\n")
+        worker.stdin.flush()
+        return int(worker.stdout.readline())
+
+    def seconds_until(expected: int) -> float:
+        start = time.monotonic()
+        while worker_status() != expected:
+            assert time.monotonic() - start < 5, f"worker still not returning {expected}"
+            time.sleep(0.01)
+        return time.monotonic() - start
+
+    try:
+        assert worker_status() == 403
+        assert worker_status() == 403  # now served from the worker's cache
+
+        assert client.patch(f"/v1/users/{owner_id}/loans/{loan_id}/share/{other_id}").status_code == 200
+        assert seconds_until(200) < 1
+
+        assert client.delete(f"/v1/users/{owner_id}/loans/{loan_id}/share/{other_id}").status_code == 200
+        assert seconds_until(403) < 1
+    finally:
+        worker.stdin.close()
+        worker.wait(timeout=10)
+
+"""
+TESTS FOR THE LOAN CACHE
+"""
+def test_repeated_month_requests_use_loan_cache(statements):
+    for month in range(1, 13):
+        assert client.get(f"/v1/users/1/loans/1/schedule/{month}").status_code == 200
+    assert len(statements) == 1
+
+def test_share_loan_invalidates_cached_denial():
+    owner = client.post("/v1/users", json={"email_address": f"{uuid.uuid4().hex}@test.com"}).json()["user_id"]
+    other = client.post("/v1/users", json={"email_address": f"{uuid.uuid4().hex}@test.com"}).json()["user_id"]
+    loan_id = client.post(f"/v1/users/{owner}/loans", json={"amount": 1000, "annual_interest_rate": 0.05, "loan_term_in_months": 12}).json()["loan_id"]
+
+    assert client.get(f"/v1/users/{other}/loans/{loan_id}/schedule/1").status_code == 403
+    assert client.get(f"/v1/users/{other}/loans/{loan_id}/schedule/1").status_code == 403
+    assert client.patch(f"/v1/users/{owner}/loans/{loan_id}/share/{other}").status_code == 200
+    assert client.get(f"/v1/users/{other}/loans/{loan_id}/schedule/1").status_code == 200
+
+def test_loan_cache_expires_and_evicts():
+    now = [0.0]
+    cache = LoanCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    loans = [LoanRow(loan_id, 1, 1000.0, 0.05, 12) for loan_id in (1, 2, 3)]
+
+    cache.put(2, loans[0], False)
+    assert cache.get(2, 1) == (loans[0], False)
+    assert cache.get(1, 1) == (loans[0], True)  # the owner needs no access entry
+    assert cache.get(3, 1) is None
+
+    now[0] = 10
+    assert cache.get(1, 1) is None
+
+    for loan in loans:
+        cache.put_loan(loan)
+    assert cache.get(1, 1) is None
+    assert cache.get(1, 3) == (loans[2], True)
+    assert cache.stats()["evictions"] == 1
+
+def test_loan_cache_invalidation():
+    cache = LoanCache()
+    loan = LoanRow(1, 1, 1000.0, 0.05, 12)
+    cache.put(2, loan, False)
+    cache.put(3, loan, False)
+
+    # a decision read before an invalidation is not cached
+    invalidations = cache.invalidations
+    assert cache.invalidate_access(2, 1)
+    cache.put(2, loan, False, invalidations)
+    assert cache.get(2, 1) is None
+    assert cache.get(3, 1) == (loan, False)
+
+    assert cache.invalidate_loan(1)
+    assert cache.get(3, 1) is None
+    assert cache.stats()["hit_rate"] == pytest.approx(1 / 3)
+
+def test_loan_cache_disabled():
+    cache = LoanCache(enabled=False)
+    cache.put(1, LoanRow(1, 1, 1000.0, 0.05, 12), True)
+    assert cache.get(1, 1) is None
+
+"""
+TESTS FOR GROUP COMMIT
+"""
+def test_group_commit_batches_concurrent_writes(tmp_path):
+    bench_engine = make_engine(f"sqlite:///{tmp_path / 'group_commit.db'}", "production")
+    Base.metadata.create_all(bind=bench_engine)
+    Session = sessionmaker(bind=bench_engine)
+    with Session() as db:
+        db.add(Users(id=1, email="test@test.com"))
+        db.commit()
+
+    writer = GroupCommitWriter(Session, max_delay_seconds=0.01)
+    futures = [
+        writer.submit(lambda session, i=i: session.scalar(queries.insert_loan_for_existing_user(1, 1000 + i, 0.05, 12)))
+        for i in range(100)
+    ]
+    loan_ids = [future.result(timeout=10) for future in futures]
+    writer.stop()
+
+    assert sorted(loan_ids) == list(range(1, 101))
+    assert writer.stats()["batches"] < 100
+    with Session() as db:
+        assert db.get(Loans, loan_ids[42]).amount == 1042
+    bench_engine.dispose()
+
+def test_group_commit_isolates_failing_operation(tmp_path):
+    bench_engine = make_engine(f"sqlite:///{tmp_path / 'group_commit.db'}", "production")
+    Base.metadata.create_all(bind=bench_engine)
+    Session = sessionmaker(bind=bench_engine)
+
+    def fail(session):
+        raise ValueError("bad operation")
+
+    writer = GroupCommitWriter(Session, max_delay_seconds=0.05)
+    first = writer.submit(lambda session: session.scalar(queries.insert_user("first@test.com")))
+    failing = writer.submit(fail)
+    second = writer.submit(lambda session: session.scalar(queries.insert_user("second@test.com")))
+
+    assert first.result(timeout=10) == 1
+    assert second.result(timeout=10) == 2
+    with pytest.raises(ValueError):
+        failing.result(timeout=10)
+    writer.stop()
+    assert writer.stats()["retried_batches"] == 1
+    bench_engine.dispose()
+
+def test_create_and_share_loan_through_group_commit(monkeypatch):
+    writer = GroupCommitWriter()
+    monkeypatch.setattr(main, "group_commit_writer", writer)
+    try:
+        owner_id, other_id, loan_id = create_shared_loan()
+        assert client.get(f"/v1/users/{owner_id}/loans/{loan_id}/schedule/1").status_code == 200
+
+        response = client.patch(f"/v1/users/{owner_id}/loans/{loan_id}/share/{other_id}")
+        assert response.status_code == 200
+        assert response.json() == {"loan_id": loan_id, "shared_with": {"user_ids": [other_id]}}
+        assert client.post("/v1/users/100000/loans", json={"amount": 1000, "annual_interest_rate": 0.05, "loan_term_in_months": 12}).status_code == 404
+        assert writer.stats()["operations"] == 3
+    finally:
+        writer.stop()
+
+"""
+TESTS FOR MATERIALIZED SCHEDULES
+"""
+def test_materializer_backfills_every_loan(tmp_path):
+    bench_engine = make_engine(f"sqlite:///{tmp_path / 'materialize.db'}", "production")
+    Base.metadata.create_all(bind=bench_engine)
+    Session = sessionmaker(bind=bench_engine)
+    with Session() as db:
+        db.add(Users(id=1, email="test@test.com"))
+        db.add_all([Loans(owner_id=1, amount=1000 + i % 3, annual_interest_rate=0.05, loan_term_in_months=360) for i in range(1200)])
+        db.commit()
+
+    materializer = ScheduleMaterializer(session_factory=Session, workers=2)
+    assert materializer.backfill() == 1200
+    assert materializer.backfill() == 0
+    materializer.shutdown()
+
+    with Session() as db:
+        row = db.get(LoanSchedules, 2)
+        schedule = unpack_schedule(row.arrays)
+        expected = amortization_schedule(1001, 0.05, 360)
+        assert schedule.monthly_payment == expected.monthly_payment
+        for actual, computed in zip(schedule[1:], expected[1:]):
+            assert actual.tolist() == computed.tolist()
+    bench_engine.dispose()
+
+def test_packed_schedule_stores_monthly_payment_once():
+    schedule = amortization_schedule(1000, 0.05, 360)
+    packed = pack_schedule(schedule)
+    assert len(packed) == 8 * (1 + 5 * 360)
+
+    unpacked = unpack_schedule(packed)
+    assert unpacked.monthly_payment == schedule.monthly_payment
+    for actual, computed in zip(unpacked[1:], schedule[1:]):
+        assert actual.tolist() == computed.tolist()
+
+def test_materialized_schedule_is_served(statements):
+    materializer = ScheduleMaterializer(workers=1)
+    with materializer.session_factory() as db:
+        loan = db.get(Loans, 4)
+        terms = (loan.id, loan.amount, loan.annual_interest_rate, loan.loan_term_in_months)
+    materializer.materialize([terms])
+    materializer.shutdown()
+    statements.clear()
+    schedule_cache.clear()
+    misses = schedule_cache.stats()["misses"]
+
+    response = client.get("/v1/users/1/loans/4/schedule")
+    summary = client.get("/v1/users/1/loans/4/schedule/10")
+    # served from the loan_schedules row in one statement without computing, then from the loan cache
+    assert len(statements) == 1
+    assert schedule_cache.stats()["misses"] == misses
+
+    assert response.status_code == 200
+    assert response.json() == client.get("/v1/users/1/loans/1/schedule").json()
+    assert summary.json()["aggregate_interest_paid"] == 26.23
+
+def metric_value(text: str, line_prefix: str) -> float:
+    return next(float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(line_prefix))
+
+def test_metrics_endpoint():
+    route = 'route="GET /v1/users/{user_id}/loans/{loan_id}/schedule"'
+    before = client.get("/metrics").text
+    count = metric_value(before, f"http_request_duration_seconds_count{{{route}}}") if route in before else 0
+    statements = metric_value(before, f"db_statements_per_request_sum{{{route}}}") if route in before else 0
+
+    loan_cache.clear()
+    schedule = client.get("/v1/users/1/loans/1/schedule")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    text = response.text
+    assert metric_value(text, f"http_request_duration_seconds_count{{{route}}}") == count + 1
+    assert metric_value(text, f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}') == count + 1
+    assert metric_value(text, f"db_statements_per_request_sum{{{route}}}") == statements + 1
+    assert metric_value(text, f"http_response_size_bytes_sum{{{route}}}") >= len(schedule.content)
+    assert metric_value(text, f"amortization_compute_seconds_sum{{{route}}}") > 0
+    assert f'http_requests_total{{{route},status="200"}}' in text
+    assert "loan_cache_hit_rate " in text
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+
+from fastapi.testclient import TestClient
+from main import app as sync_app
+import main_async
+from main_async import app
+from database.database import create_tables
+
+# TestClient only runs startup events inside a `with` block, so create/migrate tables here
+create_tables()
+client = TestClient(app)
+sync_client = TestClient(sync_app)
+
+"""
+TESTS THAT THE ASYNC APP MATCHES THE SYNC APP
+"""
+@pytest.mark.parametrize("path", [
+    "/v1/users/1/loans",
+    "/v1/users/1/loans?limit=10&offset=10",
+    "/v1/users/1/loans?limit=5&cursor=",
+    "/v1/users/100/loans",
+    "/v1/users/1/loans/1/schedule",
+    "/v1/users/1/loans/1/schedule?stream=1",
+    "/v1/users/1/loans/1/schedule?from_month=2&to_month=11&step=3",
+    "/v1/users/1/loans/1/schedule?to_month=0",
+    "/v1/users/1/loans/100/schedule",
+    "/v1/users/1/loans/1/schedule/10",
+    "/v1/users/1/loans/1/schedule/13",
+    "/v1/users/3/loans/10/schedule/10",
+])
+def test_async_get_matches_sync(path):
+    response = client.get(path)
+    expected = sync_client.get(path)
+    assert response.status_code == expected.status_code
+    assert response.json() == expected.json()
+
+def test_async_create_loan_with_invalid_parameters():
+    response = client.post("/v1/users/1/loans", json={"amount": -1000, "annual_interest_rate": 0.05, "loan_term_in_months": 12})
+    assert response.status_code == 422
+    assert response.json() == {"detail": "Invalid loan parameters"}
+
+def test_async_create_user_with_existing_email():
+    response = client.post("/v1/users", json={"email_address": "test@test.com"})
+    assert response.status_code == 409
+    assert response.json() == {"detail": "Email already exists"}
+
+def test_async_share_loan_when_user_is_already_shared():
+    response = client.patch("/v1/users/1/loans/1/share/1")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "User is already shared or is the loan owner"}
+
+def test_async_share_loan_when_user_is_not_the_loan_owner():
+    response = client.patch("/v1/users/2/loans/20/share/1")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "You do not have permission to share this loan"}
+
+def test_async_revoke_loan_share_when_user_is_not_the_loan_owner():
+    response = client.delete("/v1/users/2/loans/20/share/1")
+    assert response.status_code == 403
+    assert response.json() == {"detail": "You do not have permission to revoke this share"}
+
+"""
+TESTS THAT THE MATH RUNS OFF THE EVENT LOOP
+"""
+@pytest.mark.parametrize("name, path", [
+    ("schedule_response", "/v1/users/1/loans/1/schedule"),
+    ("exact_schedule_response", "/v1/users/1/loans/1/schedule?exact=1"),
+    ("summary_response", "/v1/users/1/loans/1/schedule/10"),
+    ("exact_summary_response", "/v1/users/1/loans/1/schedule/10?exact=1"),
+])
+def test_async_math_runs_in_threadpool(monkeypatch, name, path):
+    compute = getattr(main_async, name)
+    on_event_loop = []
+    def wrapped(*args):
+        try:
+            asyncio.get_running_loop()
+            on_event_loop.append(True)
+        except RuntimeError:
+            on_event_loop.append(False)
+        return compute(*args)
+    monkeypatch.setattr(main_async, name, wrapped)
+
+    response = client.get(path)
+    assert response.status_code == 200
+    assert on_event_loop == [False]